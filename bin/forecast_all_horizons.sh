@@ -60,24 +60,65 @@ run_any() {
   log "done  ${model} (H=${h})"
 }
 
+# 컨테이너 1개 / 프로세스 1개로 모든 모델 x horizon 실행 (run_all.py)
+run_all() {
+  log "start run_all (mode=${RUN_MODE:-train} MODELS=${MODELS} HORIZONS=${HORIZONS})"
+  docker run --rm --network "${NET}" \
+    --entrypoint python \
+    -v "${FORECAST_APP}":/app \
+    ${PG_ENV_OPTS} ${S3_ENV_OPTS} \
+    -e PAIRS="${PAIR}" -e MODELS="${MODELS}" -e HORIZONS="${HORIZONS}" -e RUN_MODE="${RUN_MODE:-train}" \
+    -e CTX="${CTX}" -e EPOCHS="${EPOCHS}" -e LR="${LR}" ${DLINEAR_SOLVER:+-e DLINEAR_SOLVER="${DLINEAR_SOLVER}"} \
+    ${BATCH_SIZE:+-e BATCH_SIZE="${BATCH_SIZE}"} ${PATIENCE:+-e PATIENCE="${PATIENCE}"} \
+    ${CKPT_ENABLED:+-e CKPT_ENABLED="${CKPT_ENABLED}"} ${FINETUNE_EPOCHS:+-e FINETUNE_EPOCHS="${FINETUNE_EPOCHS}"} \
+    ${RUN_WORKERS:+-e RUN_WORKERS="${RUN_WORKERS}"} ${TORCH_THREADS:+-e TORCH_THREADS="${TORCH_THREADS}"} \
+    "${IMG}" -u run_all.py
+  log "done  run_all"
+}
+
+# 실제 종가가 생긴 과거 예측을 채점 -> fx_forecast_scores (새로 채점 가능한 행만, scorer.py)
+run_score() {
+  log "start scorer"
+  docker run --rm --network "${NET}" \
+    --entrypoint python \
+    -v "${FORECAST_APP}":/app \
+    ${PG_ENV_OPTS} \
+    -e HORIZONS="${HORIZONS}" \
+    ${SCORE_WINDOW_DAYS:+-e SCORE_WINDOW_DAYS="${SCORE_WINDOW_DAYS}"} \
+    "${IMG}" -u scorer.py
+  log "done  scorer"
+}
+
+MODELS="${MODELS:-dlinear,lstm,gru,arima}"
+HORIZONS="${HORIZONS:-1,5,7}"
+
 log "=== forecast_all_horizons.sh start ==="
 
-# H = 1 (하루치)
-run_dlinear 1
-run_any arima 1
-run_any lstm 1
-run_any gru 1
-
-# H = 5 (5일치)
-run_dlinear 5       # dlinear 5일치
-run_any lstmh5 5
-run_any gruh5 5
-run_any arimah5 5
-
-# H = 7 (7일치)
-run_dlinear 7       # dlinear 7일치
-run_any lstmh7 7
-run_any gruh7 7
-run_any arimah7 7
+if [ "${FORECAST_LEGACY:-0}" = "1" ]; then
+  # 기존 방식: 모델 x horizon 마다 docker run (12회)
+  # H = 1 (하루치)
+  run_dlinear 1
+  run_any arima 1
+  run_any lstm 1
+  run_any gru 1
+
+  # H = 5 (5일치)
+  run_dlinear 5       # dlinear 5일치
+  run_any lstmh5 5
+  run_any gruh5 5
+  run_any arimah5 5
+
+  # H = 7 (7일치)
+  run_dlinear 7       # dlinear 7일치
+  run_any lstmh7 7
+  run_any gruh7 7
+  run_any arimah7 7
+else
+  run_all
+fi
+
+if [ "${FORECAST_SCORE:-1}" = "1" ]; then
+  run_score
+fi
 
 log "=== forecast_all_horizons.sh done ==="
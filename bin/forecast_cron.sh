@@ -1,5 +1,8 @@
 #!/usr/bin/env bash
+# wrapper: forecast_all_horizons.sh 로 넘김 (README 7절)
 set -euo pipefail
+PATH=/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin
+# dlinear 는 run_all.py 의 분해형 DLinear (forecast/train_dlinear.py 의 Linear(CTX->H) 와 다른 모델)
 
 LOG_DIR=/home/ssm-user/fx-stack/logs
 mkdir -p "$LOG_DIR"
@@ -8,14 +11,4 @@ STAMP=$(date +%Y%m)
 # 로그 리다이렉션
 exec >>"$LOG_DIR/forecast_${STAMP}.log" 2>&1
 
-# 실제 실행
-/usr/bin/docker run --rm --network fx-stack_fxnet \
-  -e PAIR=USDKRW -e CTX=96 -e H=1 \
-  -e EPOCHS=200 -e LR=1e-3 \
-  -e POSTGRES_DB=fxdb -e POSTGRES_USER=fxuser -e POSTGRES_PASSWORD=fxpass123 \
-  -e POSTGRES_HOST=postgres -e POSTGRES_PORT=5432 \
-  -e SAVE_TO_MINIO=true \
-  -e MINIO_ENDPOINT=http://minio:9000 \
-  -e MINIO_ROOT_USER=minioadmin -e MINIO_ROOT_PASSWORD=minioadmin123 \
-  -e MINIO_BUCKET=fx-raw \
-  fxstack/forecast:dlinear
+PAIR="${PAIR:-USDKRW}" MODELS=dlinear HORIZONS=1 exec "$(dirname "$0")/forecast_all_horizons.sh"
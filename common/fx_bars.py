@@ -0,0 +1,183 @@
+"""
+fx_rates -> 1분봉/일봉(OHLC) 증분 집계 (ingestor, yf_daily 가 틱을 쓴 같은 트랜잭션에서 호출)
+
+- fx_bars_1m    : (pair, bucket)   bucket = 분 단위 시작 시각
+- fx_bars_daily : (pair, kst_date) 1분봉을 다시 모은 KST 일봉 (close 가 그날 종가)
+
+배치에 들어온 틱이 걸친 (pair, 분) / (pair, KST 날짜)만 fx_rates 에서 다시 계산한다.
+늦게 도착한 틱, 같은 (pair, ts) 재전송/가격 정정이 와도 결과가 원본과 같고,
+값이 실제로 바뀐 봉만 UPDATE 된다.
+여러 writer(ingestor 워커들, yf_daily)가 같은 봉을 동시에 건드리면, 재계산 전에 봉마다
+pg_advisory_xact_lock 을 잡는다 (별도 statement) -> 뒤 트랜잭션은 앞 트랜잭션 COMMIT 후의
+스냅샷으로 다시 계산하므로 서로 안 보이는 틱으로 만든 봉이 마지막에 덮어쓰지 않는다.
+
+기존 fx_rates 로 전체 재계산: `python -m common.fx_bars`
+"""
+
+BARS_DDL = """
+CREATE TABLE IF NOT EXISTS fx_bars_1m (
+  pair       text NOT NULL,
+  bucket     timestamptz NOT NULL,
+  open       numeric(12,6) NOT NULL,
+  high       numeric(12,6) NOT NULL,
+  low        numeric(12,6) NOT NULL,
+  close      numeric(12,6) NOT NULL,
+  n_ticks    int NOT NULL,
+  last_ts    timestamptz NOT NULL,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (pair, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS fx_bars_daily (
+  pair       text NOT NULL,
+  kst_date   date NOT NULL,
+  open       numeric(12,6) NOT NULL,
+  high       numeric(12,6) NOT NULL,
+  low        numeric(12,6) NOT NULL,
+  close      numeric(12,6) NOT NULL,
+  n_ticks    int NOT NULL,
+  last_ts    timestamptz NOT NULL,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (pair, kst_date)
+);
+
+-- 예측 잡/Superset 이 읽는 일별 종가 뷰 (이미 다른 정의가 있으면 건드리지 않음)
+DO $$
+BEGIN
+  IF to_regclass('fx_daily_latest') IS NULL THEN
+    CREATE VIEW fx_daily_latest AS
+    SELECT kst_date, pair, close AS price, last_ts AS ts FROM fx_bars_daily;
+  END IF;
+  IF to_regclass('fx_features_daily') IS NULL THEN
+    CREATE VIEW fx_features_daily AS
+    SELECT kst_date, pair, close AS price FROM fx_bars_daily;
+  END IF;
+END $$;
+"""
+
+# {src}: (ts, pair) 를 내주는 FROM 절 -> 배치(unnest) 또는 fx_rates 전체
+_BARS_1M = """
+WITH touched AS (
+  SELECT DISTINCT pair, date_trunc('minute', ts) AS bucket FROM {src}
+), agg AS (
+  SELECT t.pair, t.bucket,
+         (array_agg(r.price ORDER BY r.ts))[1]      AS open,
+         max(r.price)                               AS high,
+         min(r.price)                               AS low,
+         (array_agg(r.price ORDER BY r.ts DESC))[1] AS close,
+         count(*)                                   AS n_ticks,
+         max(r.ts)                                  AS last_ts
+  FROM touched t
+  JOIN fx_rates r
+    ON r.pair = t.pair AND r.ts >= t.bucket AND r.ts < t.bucket + interval '1 minute'
+  GROUP BY t.pair, t.bucket
+)
+INSERT INTO fx_bars_1m AS b (pair, bucket, open, high, low, close, n_ticks, last_ts)
+SELECT pair, bucket, open, high, low, close, n_ticks, last_ts FROM agg
+ON CONFLICT (pair, bucket) DO UPDATE
+  SET open=EXCLUDED.open, high=EXCLUDED.high, low=EXCLUDED.low, close=EXCLUDED.close,
+      n_ticks=EXCLUDED.n_ticks, last_ts=EXCLUDED.last_ts, updated_at=now()
+  WHERE (b.open, b.high, b.low, b.close, b.n_ticks, b.last_ts)
+        IS DISTINCT FROM
+        (EXCLUDED.open, EXCLUDED.high, EXCLUDED.low, EXCLUDED.close, EXCLUDED.n_ticks, EXCLUDED.last_ts)
+"""
+
+# 1분봉이 먼저 반영된 뒤(별도 statement) 해당 KST 날짜의 1분봉만 모아 일봉 계산
+_BARS_DAILY = """
+WITH touched AS (
+  SELECT DISTINCT pair, (ts AT TIME ZONE 'Asia/Seoul')::date AS kst_date FROM {src}
+), agg AS (
+  SELECT t.pair, t.kst_date,
+         (array_agg(b.open  ORDER BY b.bucket))[1]      AS open,
+         max(b.high)                                    AS high,
+         min(b.low)                                     AS low,
+         (array_agg(b.close ORDER BY b.bucket DESC))[1] AS close,
+         sum(b.n_ticks)                                 AS n_ticks,
+         max(b.last_ts)                                 AS last_ts
+  FROM touched t
+  JOIN fx_bars_1m b
+    ON b.pair = t.pair
+   AND b.bucket >= t.kst_date::timestamp AT TIME ZONE 'Asia/Seoul'
+   AND b.bucket <  (t.kst_date + 1)::timestamp AT TIME ZONE 'Asia/Seoul'
+  GROUP BY t.pair, t.kst_date
+)
+INSERT INTO fx_bars_daily AS d (pair, kst_date, open, high, low, close, n_ticks, last_ts)
+SELECT pair, kst_date, open, high, low, close, n_ticks, last_ts FROM agg
+ON CONFLICT (pair, kst_date) DO UPDATE
+  SET open=EXCLUDED.open, high=EXCLUDED.high, low=EXCLUDED.low, close=EXCLUDED.close,
+      n_ticks=EXCLUDED.n_ticks, last_ts=EXCLUDED.last_ts, updated_at=now()
+  WHERE (d.open, d.high, d.low, d.close, d.n_ticks, d.last_ts)
+        IS DISTINCT FROM
+        (EXCLUDED.open, EXCLUDED.high, EXCLUDED.low, EXCLUDED.close, EXCLUDED.n_ticks, EXCLUDED.last_ts)
+"""
+
+# 배치가 걸친 1분봉/일봉마다 advisory lock (트랜잭션 끝까지 유지).
+# 전체 키를 정렬된 순서로 한 번에 잡아 워커끼리 교착되지 않게 한다.
+# 반드시 재계산 statement 보다 먼저 따로 실행할 것 (READ COMMITTED 스냅샷은 statement 시작 시점)
+_BARS_LOCK = """
+SELECT count(pg_advisory_xact_lock(k1, k2)) FROM (
+  SELECT DISTINCT k.k1, k.k2
+  FROM {src}
+  CROSS JOIN LATERAL (VALUES
+    (hashtext('fx_bars_1m:' || pair),    (extract(epoch FROM date_trunc('minute', ts)) / 60)::int),
+    (hashtext('fx_bars_daily:' || pair), (ts AT TIME ZONE 'Asia/Seoul')::date - date '2000-01-01')
+  ) AS k(k1, k2)
+  ORDER BY 1, 2
+) l
+"""
+
+_SRC_PG      = "unnest(%s::timestamptz[], %s::text[]) AS u(ts, pair)"
+_SRC_ASYNCPG = "unnest($1::timestamptz[], $2::text[]) AS u(ts, pair)"
+
+# psycopg2: 세 statement 를 한 번에 보내 왕복 1회 (파라미터: ts, pair x 3)
+REFRESH_SQL = ";".join(q.format(src=_SRC_PG) for q in (_BARS_LOCK, _BARS_1M, _BARS_DAILY))
+# asyncpg: 파라미터가 있으면 statement 1개씩 실행해야 함 (LOCK -> 1M -> DAILY 순서)
+LOCK_SQL_ASYNCPG          = _BARS_LOCK.format(src=_SRC_ASYNCPG)
+REFRESH_1M_SQL_ASYNCPG    = _BARS_1M.format(src=_SRC_ASYNCPG)
+REFRESH_DAILY_SQL_ASYNCPG = _BARS_DAILY.format(src=_SRC_ASYNCPG)
+
+
+def ensure_schema(cur):
+    cur.execute(BARS_DDL)
+
+
+def refresh(cur, ts_values, pairs):
+    """방금 UPSERT 한 틱(ts, pair 컬럼)이 걸친 1분봉/일봉만 다시 계산"""
+    if ts_values:
+        cur.execute(REFRESH_SQL, (ts_values, pairs) * 3)
+
+
+def backfill(conn):
+    """fx_rates 전체로 봉을 다시 만들고, fx_daily_latest 뷰를 일봉 기준으로 교체"""
+    with conn.cursor() as cur:
+        ensure_schema(cur)
+        cur.execute(_BARS_1M.format(src="fx_rates"))
+        print(f"[fx_bars] 1m bars upserted: {cur.rowcount}", flush=True)
+        cur.execute(_BARS_DAILY.format(src="fx_rates"))
+        print(f"[fx_bars] daily bars upserted: {cur.rowcount}", flush=True)
+        # 기존 DISTINCT ON(fx_rates 전체 스캔) 뷰 -> 일봉 테이블 조회
+        cur.execute("""
+          CREATE OR REPLACE VIEW fx_daily_latest AS
+          SELECT kst_date, pair, close AS price, last_ts AS ts FROM fx_bars_daily
+        """)
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('fx_features_daily')")
+        row = cur.fetchone()
+        if row and row[0] != "v":
+            print("[fx_bars] fx_features_daily is not a view; left as is "
+                  "(drop it and rerun to serve it from fx_bars_daily)", flush=True)
+        else:
+            cur.execute("""
+              CREATE OR REPLACE VIEW fx_features_daily AS
+              SELECT kst_date, pair, close AS price FROM fx_bars_daily
+            """)
+    conn.commit()
+
+
+if __name__ == "__main__":
+    import os, psycopg2
+    dsn = (f"dbname={os.getenv('POSTGRES_DB')} user={os.getenv('POSTGRES_USER')} "
+           f"password={os.getenv('POSTGRES_PASSWORD')} "
+           f"host={os.getenv('POSTGRES_HOST','postgres')} port={os.getenv('POSTGRES_PORT','5432')}")
+    conn = psycopg2.connect(dsn)
+    backfill(conn)
+    conn.close()
@@ -0,0 +1,175 @@
+"""
+fx_rates 공통 DDL / UPSERT (ingestor, yf_daily 가 같이 사용)
+
+- 키: (pair, ts)  -> 여러 통화쌍이 같은 시각에 들어와도 덮어쓰지 않음
+- 월 단위 RANGE 파티션 (ts, UTC 기준). 파티션은 쓰기 직전에 필요한 달만 생성
+- ts 에 BRIN 인덱스 (시간순 적재라 매우 작고, 기간 스캔에 유리)
+
+기존(파티션 없는) fx_rates 는 `python -m common.fx_schema` 로 이관한다.
+sql/init/001_schema.sql 의 fx_rates 정의도 이 파일과 동일하게 유지할 것.
+"""
+from datetime import date, timedelta, timezone
+
+# 워커들이 동시에 띄워지면 CREATE OR REPLACE FUNCTION 등이 pg_proc/pg_type 에서 충돌
+# ("tuple concurrently updated") -> 트랜잭션 advisory lock 으로 DDL 을 한 번에 하나씩 (COMMIT 때 해제)
+FX_RATES_DDL = """
+SELECT pg_advisory_xact_lock(hashtext('fx_rates_ddl'));
+
+CREATE TABLE IF NOT EXISTS fx_rates (
+  ts    timestamptz NOT NULL,
+  pair  text NOT NULL,
+  price numeric(12,6) NOT NULL,
+  PRIMARY KEY (pair, ts)
+) PARTITION BY RANGE (ts);
+
+CREATE INDEX IF NOT EXISTS fx_rates_ts_brin ON fx_rates USING brin (ts);
+
+CREATE OR REPLACE FUNCTION fx_rates_ensure_partition(month_start date) RETURNS void AS $$
+DECLARE
+  part text := format('fx_rates_%s', to_char(month_start, 'YYYYMM'));
+BEGIN
+  IF to_regclass(part) IS NULL THEN
+    EXECUTE format('CREATE TABLE %I PARTITION OF fx_rates FOR VALUES FROM (%L) TO (%L)',
+                   part,
+                   month_start::timestamp AT TIME ZONE 'UTC',
+                   (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC');
+  END IF;
+EXCEPTION WHEN duplicate_table THEN
+  NULL;  -- 다른 워커가 먼저 만든 경우
+END $$ LANGUAGE plpgsql;
+"""
+
+# 컬럼 배열(ts[], pair[], price[])을 unnest 로 펼쳐 한 번에 UPSERT.
+# 같은 (pair, ts) 가 한 배치에 여러 번 오면 마지막 값만 남긴다 (ON CONFLICT 중복 충돌 방지).
+_UPSERT = """
+  INSERT INTO fx_rates(ts, pair, price)
+  SELECT DISTINCT ON (pair, ts) ts, pair, price
+  FROM unnest({0}::timestamptz[], {1}::text[], {2}::{3}[]) WITH ORDINALITY AS t(ts, pair, price, ord)
+  ORDER BY pair, ts, ord DESC
+  ON CONFLICT (pair, ts) DO UPDATE SET price=EXCLUDED.price
+"""
+UPSERT_SQL         = _UPSERT.format("%s", "%s", "%s", "numeric")   # psycopg2
+UPSERT_SQL_ASYNCPG = _UPSERT.format("$1", "$2", "$3", "float8")    # asyncpg
+
+ENSURE_PARTITIONS_SQL         = "SELECT fx_rates_ensure_partition(m) FROM unnest(%s::date[]) AS m"
+ENSURE_PARTITIONS_SQL_ASYNCPG = "SELECT fx_rates_ensure_partition(m) FROM unnest($1::date[]) AS m"
+
+# 이 프로세스에서 이미 만들어진 것을 확인한 파티션(월 1일)
+_known_months = set()
+
+
+def _month(d):
+    return date(d.year, d.month, 1)
+
+
+def missing_months(ts_values):
+    """
+    ts 들이 실제로 걸친 달 중 아직 확인하지 않은 달(월 1일) 리스트 (min~max 사이 빈 달은 만들지 않음).
+    naive ts 는 세션 타임존으로 해석되므로 틱마다 앞뒤 하루씩 여유를 둔다.
+    """
+    months = set()
+    for t in ts_values:
+        t = t.astimezone(timezone.utc) if t.tzinfo else t.replace(tzinfo=timezone.utc)
+        months.add(_month(t - timedelta(days=1)))
+        months.add(_month(t + timedelta(days=1)))
+    return sorted(months - _known_months)
+
+
+def remember_months(months):
+    """파티션 생성이 COMMIT 된 뒤에 호출 (롤백되면 다음 배치에서 다시 만든다)"""
+    _known_months.update(months)
+
+
+def is_partitioned(cur):
+    cur.execute("""
+      SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('fx_rates'))
+    """)
+    return cur.fetchone()[0]
+
+
+def ensure_schema(cur):
+    cur.execute("SELECT to_regclass('fx_rates') IS NOT NULL")
+    if cur.fetchone()[0] and not is_partitioned(cur):
+        raise RuntimeError("fx_rates is the old unpartitioned table; run `python -m common.fx_schema` first")
+    cur.execute(FX_RATES_DDL)
+
+
+def ensure_partitions(cur, ts_values):
+    """필요한 월 파티션을 만들고, 만든 달 리스트를 돌려준다 (COMMIT 후 remember_months 로 넘길 것)"""
+    months = missing_months(ts_values)
+    if months:
+        cur.execute(ENSURE_PARTITIONS_SQL, (months,))
+    return months
+
+
+# ---------- 기존 테이블 이관 ----------
+MIGRATE_SQL = """
+ALTER TABLE fx_rates RENAME TO fx_rates_legacy;
+-- 기존 PK 이름은 환경마다 다름 (덤프: fx_rates_pk) -> 있으면 조회해서 새 테이블의 fx_rates_pkey 와 겹치지 않게 변경
+DO $$
+DECLARE
+  pk text;
+BEGIN
+  SELECT conname INTO pk FROM pg_constraint
+  WHERE conrelid = 'fx_rates_legacy'::regclass AND contype = 'p';
+  IF pk IS NOT NULL THEN
+    EXECUTE format('ALTER TABLE fx_rates_legacy RENAME CONSTRAINT %I TO fx_rates_legacy_pkey', pk);
+  END IF;
+END $$;
+{ddl}
+SELECT fx_rates_ensure_partition(m::date)
+FROM generate_series(
+  date_trunc('month', (SELECT min(ts) FROM fx_rates_legacy) AT TIME ZONE 'UTC'),
+  (SELECT max(ts) FROM fx_rates_legacy) AT TIME ZONE 'UTC',
+  interval '1 month') AS m;
+INSERT INTO fx_rates(ts, pair, price)
+SELECT ts, pair, price FROM fx_rates_legacy
+ON CONFLICT (pair, ts) DO NOTHING;
+
+-- 뷰를 새 테이블로 다시 연결한 뒤 legacy 삭제
+CREATE OR REPLACE VIEW v_fx_all AS
+SELECT r.ts, r.price, f.dollar_index, f.nasdaq, f.us10y, f.gold, p.pred_price
+FROM fx_rates r
+LEFT JOIN fx_features f ON f.ts = r.ts
+LEFT JOIN fx_predict  p ON p.ts = r.ts;
+DO $$
+BEGIN
+  IF to_regclass('fx_daily_latest') IS NOT NULL THEN
+    CREATE OR REPLACE VIEW fx_daily_latest AS
+    SELECT DISTINCT ON (date_trunc('day', ts AT TIME ZONE 'Asia/Seoul'), pair)
+           date_trunc('day', ts AT TIME ZONE 'Asia/Seoul')::date AS kst_date,
+           pair, price, ts
+    FROM fx_rates
+    ORDER BY date_trunc('day', ts AT TIME ZONE 'Asia/Seoul'), pair, ts DESC;
+  END IF;
+END $$;
+DROP TABLE fx_rates_legacy;
+""".format(ddl=FX_RATES_DDL)
+
+
+def migrate(conn):
+    """파티션 없는 기존 fx_rates 를 (pair, ts) 키 파티션 테이블로 한 트랜잭션에 이관"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('fx_rates') IS NOT NULL")
+        exists = cur.fetchone()[0]
+        if not exists:
+            ensure_schema(cur)
+            print("[fx_schema] created fx_rates", flush=True)
+        elif is_partitioned(cur):
+            cur.execute(FX_RATES_DDL)
+            print("[fx_schema] fx_rates already partitioned", flush=True)
+        else:
+            cur.execute(MIGRATE_SQL)
+            cur.execute("SELECT count(*) FROM fx_rates")
+            print(f"[fx_schema] migrated fx_rates ({cur.fetchone()[0]} rows)", flush=True)
+    conn.commit()
+
+
+if __name__ == "__main__":
+    import os, psycopg2
+    dsn = (f"dbname={os.getenv('POSTGRES_DB')} user={os.getenv('POSTGRES_USER')} "
+           f"password={os.getenv('POSTGRES_PASSWORD')} "
+           f"host={os.getenv('POSTGRES_HOST','postgres')} port={os.getenv('POSTGRES_PORT','5432')}")
+    conn = psycopg2.connect(dsn)
+    migrate(conn)
+    conn.close()
@@ -0,0 +1,83 @@
+"""
+Kafka 틱 메시지(`pair,price,ts`) 파서.
+
+- ts 는 정수 epoch(초/밀리초, 9자리 이상) -> datetime.fromisoformat -> dateutil 순으로 시도
+  (dateutil 은 느리므로 위 두 경로가 실패한 특이 포맷에서만 사용)
+- now ± INGEST_MAX_TS_SKEW_DAYS(기본 3650일) 밖의 ts 는 거부 (잘못 들어온 값 하나가
+  fx_rates 월 파티션을 엉뚱한 달에 만들지 않게)
+- poll 배치 전체를 컬럼 단위 리스트(TickBatch)로 만들어 Postgres unnest() 에 바로 넘긴다
+"""
+import os, math
+from datetime import datetime, timedelta, timezone
+from dateutil import parser as dtp
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# 이 값 이상이면 epoch 밀리초로 본다 (초 단위라면 서기 5138년)
+EPOCH_MS_THRESHOLD = 100_000_000_000
+# 숫자만으로 된 ts 는 이 자릿수 이상일 때만 epoch 로 본다 (9자리 = 1973-03 이후 초)
+# -> "20250101" 같은 8자리 compact 날짜는 아래 ISO/dateutil 경로로 간다
+EPOCH_MIN_DIGITS = 9
+MAX_TS_SKEW = timedelta(days=int(os.getenv("INGEST_MAX_TS_SKEW_DAYS","3650")))
+
+
+class TickBatch:
+    """한 poll 배치의 컬럼형 결과. ts/pair/price 는 같은 길이의 리스트."""
+    __slots__ = ("ts", "pair", "price")
+
+    def __init__(self):
+        self.ts = []
+        self.pair = []
+        self.price = []
+
+    def __len__(self):
+        return len(self.ts)
+
+
+def parse_ts(s):
+    digits = s[1:] if s[:1] == "-" else s
+    if digits.isdigit() and len(digits) >= EPOCH_MIN_DIGITS:
+        v = int(s)
+        if abs(v) >= EPOCH_MS_THRESHOLD:
+            return _EPOCH + timedelta(milliseconds=v)
+        return _EPOCH + timedelta(seconds=v)
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        return dtp.parse(s)
+
+
+def parse_line(value):
+    """`pair,price,ts` 한 줄 -> (ts, pair, price). 형식이 틀리면 ValueError."""
+    pair, price, ts = value.split(",")
+    pair = pair.strip()
+    if not pair:
+        raise ValueError("empty pair")
+    p = float(price)
+    if not math.isfinite(p):
+        raise ValueError(f"non-finite price: {price!r}")
+    return parse_ts(ts.strip()), pair, p
+
+
+def parse_values(values):
+    """
+    메시지 문자열 리스트 -> (TickBatch, errors)
+    errors : 파싱 실패한 (value, exception) 리스트 (배치 전체를 실패시키지 않음)
+    """
+    batch = TickBatch()
+    ts_col, pair_col, price_col = batch.ts, batch.pair, batch.price
+    errors = []
+    now = datetime.now(timezone.utc)
+    lo, hi = now - MAX_TS_SKEW, now + MAX_TS_SKEW
+    lo_naive, hi_naive = lo.replace(tzinfo=None), hi.replace(tzinfo=None)
+    for value in values:
+        try:
+            t, pair, p = parse_line(value)
+            if not (lo <= t <= hi if t.tzinfo else lo_naive <= t <= hi_naive):
+                raise ValueError(f"ts out of range: {t.isoformat()}")
+        except Exception as e:
+            errors.append((value, e))
+            continue
+        ts_col.append(t)
+        pair_col.append(pair)
+        price_col.append(p)
+    return batch, errors
@@ -0,0 +1,130 @@
+"""
+ARIMA 증분 엔진 -- 매번 전체 히스토리로 fit 하지 않고, 저장된 파라미터 + 상태공간 상태로 새 관측만 filter
+
+체크포인트 (ckpt, 키 {pair}/arima/ctx0_h0):
+  order, params, aic        : 마지막 추정 결과
+  n_obs, prefix_hash        : 상태를 만들 때 쓴 시리즈 길이 / 그 구간 해시 (과거 값 정정 감지)
+  state, state_cov          : 마지막 관측 직전 시점의 예측 상태 a_{n-1}, P_{n-1}
+  fitted_at, searched_at    : 마지막 전체 추정 / 차수 탐색 날짜 (UTC, ISO)
+
+매 실행:
+  - 새로 들어온 값만 (마지막 관측 1개 + 신규) 저장된 상태에서 이어서 Kalman filter -> 예측
+    (statsmodels results.extend 와 같은 계산, 파라미터 재추정 없음, 비용이 히스토리 길이와 무관)
+  - ARIMA_REFIT_DAYS 가 지났거나 과거 값이 바뀌었으면 전체 재추정 (이전 params 에서 출발)
+  - ARIMA_SEARCH_DAYS 가 지났으면 AIC 로 차수 탐색 (p,q in 0..ARIMA_MAX_PQ, d=ARIMA_D)
+  - ARIMA_FORCE=fit|search 로 이번 실행만 강제
+
+env: ARIMA_ORDER=1,1,1  ARIMA_REFIT_DAYS=7  ARIMA_SEARCH_DAYS=30  ARIMA_MAX_PQ=2  ARIMA_D=1
+     ARIMA_FIT_WINDOW=0  (전체 추정/탐색에 쓸 최근 구간 길이, 0=전체)
+"""
+import os, datetime as dt, warnings
+import numpy as np
+import ckpt
+
+DEFAULT_ORDER = tuple(int(x) for x in os.getenv("ARIMA_ORDER","1,1,1").split(","))
+REFIT_DAYS    = int(os.getenv("ARIMA_REFIT_DAYS","7"))
+SEARCH_DAYS   = int(os.getenv("ARIMA_SEARCH_DAYS","30"))
+MAX_PQ        = int(os.getenv("ARIMA_MAX_PQ","2"))
+D             = int(os.getenv("ARIMA_D","1"))
+FIT_WINDOW    = int(os.getenv("ARIMA_FIT_WINDOW","0"))
+FORCE         = os.getenv("ARIMA_FORCE","").lower()   # "" | fit | search
+
+
+def _today():
+    return dt.datetime.utcnow().date()
+
+
+def _older_than(iso, days):
+    return iso is None or (_today() - dt.date.fromisoformat(iso)).days >= days
+
+
+def _fit(y, order, start_params=None):
+    from statsmodels.tsa.arima.model import ARIMA
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return ARIMA(y, order=order).fit(start_params=start_params)
+
+
+def search_order(y):
+    """AIC 최소 (p, D, q). 후보마다 fit 1번 -> 스케줄로만 실행. 전부 실패하면 DEFAULT_ORDER 로 fit"""
+    best = None
+    for p in range(MAX_PQ + 1):
+        for q in range(MAX_PQ + 1):
+            try:
+                res = _fit(y, (p, D, q))
+            except Exception:
+                continue
+            if best is None or res.aic < best[1].aic:
+                best = ((p, D, q), res)
+    if best is None:
+        print(f"[arima] order search: no candidate fit, fallback {DEFAULT_ORDER}", flush=True)
+        return DEFAULT_ORDER, _fit(y, DEFAULT_ORDER)
+    print(f"[arima] order search -> {best[0]} aic={best[1].aic:.2f}", flush=True)
+    return best
+
+
+def _state_payload(res_params, order, aic, y, res, fitted_at, searched_at):
+    """res: 시리즈 y 끝까지 filter 한 결과 -> 다음 실행용 상태 (마지막 관측 직전 예측 상태)"""
+    n = len(y)
+    return {
+        "order": list(order), "params": np.asarray(res_params, dtype=float).tolist(), "aic": float(aic),
+        "n_obs": n, "prefix_hash": ckpt.data_hash(y),
+        "state": np.asarray(res.predicted_state[:, -2]).tolist(),
+        "state_cov": np.asarray(res.predicted_state_cov[:, :, -2]).tolist(),
+        "fitted_at": fitted_at, "searched_at": searched_at,
+    }
+
+
+def _extend(prev, y):
+    """저장된 상태에서 y[n_obs-1:] 만 filter (파라미터 고정)"""
+    from statsmodels.tsa.arima.model import ARIMA
+    n = prev["n_obs"]
+    mod = ARIMA(y[n-1:], order=tuple(prev["order"]))
+    mod.initialize_known(np.asarray(prev["state"]), np.asarray(prev["state_cov"]))
+    return mod.filter(np.asarray(prev["params"]))
+
+
+def forecast(series, h, pair):
+    """series(전체 히스토리) -> h 스텝 예측. 필요할 때만 재추정/차수 탐색, 결과 상태는 ckpt 에 저장"""
+    y = np.asarray(series, dtype=float)
+    prev = ckpt.load_latest(pair, "arima", 0, 0)
+    if prev is not None and "state" not in prev:
+        prev = None   # 이전 형식(params 만) -> 전체 추정부터
+
+    reason = None
+    if prev is None:
+        reason = "no checkpoint"
+    elif FORCE in ("fit", "search"):
+        reason = f"ARIMA_FORCE={FORCE}"
+    elif len(y) < prev["n_obs"] or ckpt.data_hash(y[:prev["n_obs"]]) != prev["prefix_hash"]:
+        reason = "history changed"
+    elif _older_than(prev.get("fitted_at"), REFIT_DAYS):
+        reason = f"refit every {REFIT_DAYS}d"
+
+    if reason is None:
+        res = _extend(prev, y)
+        state = _state_payload(prev["params"], prev["order"], prev["aic"], y, res,
+                               prev["fitted_at"], prev.get("searched_at"))
+        print(f"[arima] {pair} extend {len(y) - prev['n_obs']} new obs (order={tuple(prev['order'])})", flush=True)
+    else:
+        fit_y = y[-FIT_WINDOW:] if FIT_WINDOW else y
+        searched_at = prev.get("searched_at") if prev else None
+        if FORCE == "search" or (ckpt.CKPT_ON and _older_than(searched_at, SEARCH_DAYS)):
+            order, res = search_order(fit_y)
+            searched_at = _today().isoformat()
+        else:
+            order = tuple(prev["order"]) if prev else DEFAULT_ORDER
+            start = prev["params"] if prev and tuple(prev["order"]) == order else None
+            res = _fit(fit_y, order, start_params=start)
+        if FIT_WINDOW and len(y) > len(fit_y):
+            # 추정은 최근 구간으로, 상태는 전체 시리즈 기준으로 다시 filter
+            from statsmodels.tsa.arima.model import ARIMA
+            params, aic = res.params, res.aic
+            res = ARIMA(y, order=order).filter(params)
+        else:
+            params, aic = res.params, res.aic
+        state = _state_payload(params, order, aic, y, res, _today().isoformat(), searched_at)
+        print(f"[arima] {pair} full fit ({reason}) order={tuple(order)} aic={aic:.2f}", flush=True)
+
+    ckpt.save(pair, "arima", 0, 0, ckpt.data_hash(y), state)
+    return np.asarray(res.forecast(steps=h), dtype=float)
@@ -0,0 +1,251 @@
+"""
+워크포워드 백테스트 (python backtest.py) -- fx_features_daily 를 과거 시점(origin)부터 다시 재생하며
+train_any.py 의 모델들(dlinear/lstm/gru/arima)을 평가, origin 별 오차를 fx_backtest_metrics 에 저장
+
+- origin t: t 까지만 보고 t+1..t+max(H) 예측 -> 실제값과 비교 (horizon = 몇 스텝 앞인지, target_date = 실제 관측 날짜)
+  BT_SCHEME=expanding : 학습 구간 [0, t]          rolling : 최근 BT_WINDOW 개 [t-BT_WINDOW+1, t]
+- origin 을 BT_REFIT 개씩 블록으로 묶어서 블록 첫 origin 에서만 학습, 블록 안 origin 은 모두
+  그 모델로 예측 (미래 정보 누출 없음)
+    dlinear/lstm/gru : 블록의 입력 윈도우 [B, CTX] 를 한 배치로 forward 1번 (ta.forecast_batch)
+                       BT_WARM=true 면 다음 블록은 직전 블록 가중치에서 FINETUNE_EPOCHS 만 이어서 학습
+    arima            : 블록 첫 origin 에서 fit 1번 + 파라미터 고정 filter 1번 -> 각 origin 의
+                       예측 상태에서 상태공간 전이로 h 스텝을 origin 전체에 대해 행렬곱으로 계산
+- 잡: torch 모델은 (pair, base) 당 1개(블록이 warm start 로 이어지므로), arima 는 블록마다 1개 ->
+  run_all.py 와 같은 spawn ProcessPoolExecutor 로 병렬 (BT_WORKERS)
+- 결과: origin x horizon 행을 pair/model 별 unnest 배열 INSERT 로, 한 트랜잭션에
+
+env: BT_SCHEME=expanding  BT_WINDOW=750  BT_DAYS=730 (마지막 몇 개 origin)  BT_STEP=1  BT_REFIT=20
+     BT_WARM=true  BT_WORKERS=RUN_WORKERS  BT_RUN_ID=<UTC 시각>
+     (+ run_all.py 의 PAIRS/MODELS/HORIZONS, train_any.py 의 CTX/EPOCHS/DB)
+"""
+import os, time, datetime as dt
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+import train_any as ta
+import run_all
+
+SCHEME  = os.getenv("BT_SCHEME","expanding").lower()   # expanding | rolling
+WINDOW  = int(os.getenv("BT_WINDOW","750"))
+DAYS    = int(os.getenv("BT_DAYS","730"))
+STEP    = int(os.getenv("BT_STEP","1"))
+REFIT   = int(os.getenv("BT_REFIT","20"))
+WARM    = os.getenv("BT_WARM","true").lower()=="true"
+WORKERS = int(os.getenv("BT_WORKERS", str(run_all.RUN_WORKERS)))
+RUN_ID  = os.getenv("BT_RUN_ID") or dt.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+
+METRICS_DDL = """
+CREATE TABLE IF NOT EXISTS fx_backtest_metrics (
+  run_id      text NOT NULL,
+  pair        text NOT NULL,
+  model       text NOT NULL,
+  horizon     int  NOT NULL,
+  origin_date date NOT NULL,
+  target_date date NOT NULL,
+  scheme      text,
+  y_pred      double precision,
+  y_true      double precision,
+  err         double precision,   -- y_pred - y_true
+  abs_err     double precision,
+  ape         double precision,   -- |err| / |y_true|
+  created_at  timestamptz DEFAULT now(),
+  PRIMARY KEY (run_id, pair, model, horizon, origin_date)
+);
+CREATE INDEX IF NOT EXISTS fx_backtest_metrics_pmh ON fx_backtest_metrics (pair, model, horizon, origin_date);
+"""
+
+INSERT_SQL = """
+INSERT INTO fx_backtest_metrics
+  (run_id, pair, model, horizon, origin_date, target_date, scheme, y_pred, y_true, err, abs_err, ape)
+SELECT :run_id, :pair, :model, h, o, t, :scheme, p, y, p - y, abs(p - y), abs(p - y) / nullif(abs(y), 0)
+FROM unnest(CAST(:h AS int[]), CAST(:o AS date[]), CAST(:t AS date[]),
+            CAST(:p AS float8[]), CAST(:y AS float8[])) AS u(h, o, t, p, y)
+ON CONFLICT (run_id, pair, model, horizon, origin_date) DO UPDATE
+  SET target_date=EXCLUDED.target_date, scheme=EXCLUDED.scheme, y_pred=EXCLUDED.y_pred, y_true=EXCLUDED.y_true,
+      err=EXCLUDED.err, abs_err=EXCLUDED.abs_err, ape=EXCLUDED.ape, created_at=now()
+"""
+
+
+def origins_for(n, h_max):
+    """평가할 origin 인덱스 (마지막 DAYS 개, 학습 윈도우가 충분한 곳부터, t+1 실제값이 있는 곳까지)"""
+    min_train = 2 * ta.CTX + h_max
+    first = max(n - 1 - DAYS, min_train - 1)
+    if SCHEME == "rolling":
+        first = max(first, min(WINDOW, n) - 1)
+    return np.arange(first, n - 1, STEP)
+
+
+def blocks_for(origins):
+    return [origins[i:i + REFIT] for i in range(0, len(origins), REFIT)]
+
+
+def train_slice(series, t0):
+    lo = 0 if SCHEME == "expanding" else max(0, t0 + 1 - WINDOW)
+    return series.iloc[lo:t0 + 1]
+
+
+def predict_torch(base, pair, series, blocks, h_max):
+    """블록마다 학습 1번 + 블록 origin 전체 forward 1번 -> [len(origins), h_max]"""
+    vals = series.to_numpy(float)
+    out, prev = [], {}
+    for blk in blocks:
+        train = train_slice(series, blk[0])
+        warm = prev if WARM else {}
+        if base == "dlinear":
+            model, _, mu, sigma = ta.fit_dlinear(train, h_max, pair=pair, warm=warm)
+        else:
+            model, _, mu, sigma = ta.fit_rnn(train, h_max, cell=base, pair=pair, warm=warm)
+        prev = {"state_dict": model.state_dict()}
+        s = ((vals - mu) / sigma).astype(np.float32)
+        S = np.lib.stride_tricks.sliding_window_view(s, ta.CTX)[blk - ta.CTX + 1]   # origin t 의 윈도우 = s[t-CTX+1 : t+1]
+        out.append(ta.forecast_batch(model, S, h_max, rnn=base != "dlinear") * sigma + mu)
+    return np.concatenate(out)
+
+
+def predict_arima(series, blocks, h_max):
+    """블록마다 fit 1번, 파라미터 고정 filter 로 각 origin 의 a_{t+1|t} -> 상태 전이로 h 스텝"""
+    import arima_engine
+    from statsmodels.tsa.arima.model import ARIMA
+    y = series.to_numpy(float)
+    out = []
+    for blk in blocks:
+        lo = 0 if SCHEME == "expanding" else max(0, blk[0] + 1 - WINDOW)
+        res = arima_engine._fit(y[lo:blk[0] + 1], arima_engine.DEFAULT_ORDER)
+        fr = ARIMA(y[lo:blk[-1] + 1], order=arima_engine.DEFAULT_ORDER).filter(res.params).filter_results
+        Z, T = fr.design[:, :, 0], fr.transition[:, :, 0]
+        d, c = fr.obs_intercept[:, 0], fr.state_intercept[:, 0]
+        A = fr.predicted_state[:, blk - lo + 1]   # [k_states, B]: origin t 까지 보고 예측한 t+1 상태
+        preds = []
+        for _ in range(h_max):
+            preds.append((Z @ A)[0] + d[0])
+            A = T @ A + c[:, None]
+        out.append(np.stack(preds, axis=1))
+    return np.concatenate(out)
+
+
+def run_bt_job(pair, base, blocks, series, h_max):
+    """잡 1개 -> (pair, base, origins, preds [B, h_max], wall_s, pid)"""
+    t0 = time.perf_counter()
+    if base == "arima":
+        preds = predict_arima(series, blocks, h_max)
+    else:
+        preds = predict_torch(base, pair, series, blocks, h_max)
+    return pair, base, np.concatenate(blocks), preds, time.perf_counter() - t0, os.getpid()
+
+
+def make_jobs(data, h_max):
+    jobs = []
+    for pair, d in data.items():
+        blocks = blocks_for(origins_for(len(d["series"]), h_max))
+        if not blocks:
+            print(f"[bt] {pair}: not enough history (rows={len(d['series'])})", flush=True)
+            continue
+        for base in run_all.MODELS:
+            if base == "arima" or not WARM:
+                jobs += [(pair, base, [b]) for b in blocks]
+            else:
+                jobs.append((pair, base, blocks))
+    return sorted(jobs, key=lambda j: run_all.COST_ORDER.get(j[1], 0))
+
+
+def run_jobs(data, h_max):
+    """-> {(pair, base): (origins, preds)}"""
+    jobs = make_jobs(data, h_max)
+    n_workers = max(1, min(WORKERS, len(jobs)))
+    print(f"[bt] {len(jobs)} jobs on {n_workers} workers x {run_all.TORCH_THREADS} torch threads", flush=True)
+
+    parts, busy = {}, 0.0
+    def done(pair, base, origins, preds, wall, pid):
+        nonlocal busy
+        parts.setdefault((pair, base), []).append((origins, preds))
+        busy += wall
+        print(f"[bt] {pair} {base} origins={len(origins)} ({wall:.2f}s, pid={pid})", flush=True)
+
+    t0 = time.perf_counter()
+    if n_workers == 1:
+        for pair, base, blocks in jobs:
+            done(*run_bt_job(pair, base, blocks, data[pair]["series"], h_max))
+    else:
+        os.environ.setdefault("OMP_NUM_THREADS", str(run_all.TORCH_THREADS))
+        with ProcessPoolExecutor(n_workers, mp_context=mp.get_context("spawn"),
+                                 initializer=run_all.init_worker, initargs=(run_all.TORCH_THREADS,)) as pool:
+            futs = [pool.submit(run_bt_job, pair, base, blocks, data[pair]["series"], h_max)
+                    for pair, base, blocks in jobs]
+            for f in as_completed(futs):
+                done(*f.result())
+    wall = time.perf_counter() - t0
+    print(f"[bt] jobs wall={wall:.2f}s sum(job)={busy:.2f}s speedup=x{busy / max(wall, 1e-9):.1f}", flush=True)
+
+    out = {}
+    for key, ps in parts.items():
+        order = np.argsort(np.concatenate([o for o, _ in ps]), kind="stable")
+        out[key] = (np.concatenate([o for o, _ in ps])[order], np.concatenate([p for _, p in ps])[order])
+    return out
+
+
+def score(dates, vals, origins, preds, h_max):
+    """origin x horizon 행렬 -> 실제값이 있는 칸만 펼친 배열들 (h, origin_date, target_date, y_pred, y_true)"""
+    H = np.arange(1, h_max + 1)
+    T = origins[:, None] + H[None, :]          # target 인덱스 [B, h_max]
+    ok = T < len(vals)
+    Tc = np.where(ok, T, 0)
+    return {"h": np.broadcast_to(H, T.shape)[ok], "o": dates[np.broadcast_to(origins[:, None], T.shape)][ok],
+            "t": dates[Tc][ok], "p": preds[ok], "y": vals[Tc][ok]}
+
+
+def save_metrics(eng, rows):
+    with eng.begin() as conn:
+        for stmt in METRICS_DDL.strip().split(";"):
+            if stmt.strip():
+                conn.execute(text(stmt))
+        for (pair, base), r in rows.items():
+            conn.execute(text(INSERT_SQL), {
+                "run_id": RUN_ID, "pair": pair, "model": base, "scheme": SCHEME,
+                "h": r["h"].tolist(), "o": pd.DatetimeIndex(r["o"]).date.tolist(), "t": pd.DatetimeIndex(r["t"]).date.tolist(),
+                "p": r["p"].tolist(), "y": r["y"].tolist(),
+            })
+    return sum(len(r["h"]) for r in rows.values())
+
+
+def summary(rows):
+    """콘솔 요약: pair x model x HORIZONS 별 MAE / MAPE"""
+    for (pair, base), r in sorted(rows.items()):
+        for h in run_all.HORIZONS:
+            m = r["h"] == h
+            if not m.any():
+                continue
+            err = np.abs(r["p"][m] - r["y"][m])
+            print(f"[bt] {pair} {run_all.model_label(base, h):<10} n={m.sum():<5} "
+                  f"MAE={err.mean():.4f} MAPE={(err / np.abs(r['y'][m])).mean()*100:.3f}%", flush=True)
+
+
+def main():
+    t0 = time.perf_counter()
+    if SCHEME not in ("expanding", "rolling"):
+        raise ValueError(f"BT_SCHEME must be expanding or rolling: {SCHEME}")
+    for base in run_all.MODELS:
+        if base not in run_all.PREDICTORS:
+            raise ValueError(f"unsupported MODEL base: {base}")
+    h_max = max(run_all.HORIZONS)
+    print(f"[bt] run_id={RUN_ID} scheme={SCHEME} PAIRS={run_all.PAIRS} MODELS={run_all.MODELS} "
+          f"HORIZONS={run_all.HORIZONS} days={DAYS} step={STEP} refit={REFIT} warm={WARM}", flush=True)
+    eng = ta.get_engine()
+    data = {}
+    for pair in run_all.PAIRS:
+        df = ta.load_series(pair, eng)
+        data[pair] = {"series": df["price"].reset_index(drop=True), "dates": df["kst_date"].to_numpy()}
+
+    fits = run_jobs(data, h_max)
+    rows = {}
+    for (pair, base), (origins, preds) in fits.items():
+        d = data[pair]
+        rows[(pair, base)] = score(d["dates"], d["series"].to_numpy(float), origins, preds, h_max)
+    n = save_metrics(eng, rows)
+    summary(rows)
+    print(f"[done] backtest {RUN_ID}: {n} rows -> fx_backtest_metrics ({time.perf_counter()-t0:.2f}s)", flush=True)
+
+
+if __name__ == "__main__":
+    main()
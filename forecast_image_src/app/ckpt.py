@@ -0,0 +1,126 @@
+"""
+모델 체크포인트 저장소 (MinIO, 기존 MINIO_BUCKET) -- 매일 처음부터 재학습하지 않고 warm start
+
+  s3://{MINIO_BUCKET}/{CKPT_PREFIX}/{pair}/{model}/ctx{CTX}_h{H}/{data_hash}.pt   <- 학습 결과
+  s3://{MINIO_BUCKET}/{CKPT_PREFIX}/{pair}/{model}/ctx{CTX}_h{H}/latest.json     <- 마지막 체크포인트 포인터
+
+- payload: torch state_dict / ARIMA params + 정규화 통계(mu, sigma) + 메타 (torch.save 1개 파일)
+- data_hash: 학습에 쓴 시리즈(날짜+가격) 해시. latest 와 같으면 데이터가 그대로라 학습 생략,
+  다르면 latest 가중치에서 FINETUNE_EPOCHS 만큼만 이어서 학습
+- MinIO 가 안 되면(접속 실패/boto3 없음) 조용히 cold start, 저장도 skip (예측 잡은 계속)
+
+env: CKPT_ENABLED=true  CKPT_PREFIX=checkpoints  FINETUNE_EPOCHS=5
+     CKPT_DIR=<경로>  (지정하면 MinIO 대신 로컬 디렉터리 사용 - 개발/테스트용)
+"""
+import os, io, json, hashlib, datetime as dt
+import numpy as np
+
+CKPT_ON         = os.getenv("CKPT_ENABLED","true").lower()=="true"
+CKPT_PREFIX     = os.getenv("CKPT_PREFIX","checkpoints")
+CKPT_DIR        = os.getenv("CKPT_DIR")
+FINETUNE_EPOCHS = int(os.getenv("FINETUNE_EPOCHS","5"))
+
+MINIO_EP     = os.getenv("MINIO_ENDPOINT","http://minio:9000")
+MINIO_USER   = os.getenv("MINIO_ROOT_USER","minioadmin")
+MINIO_PASS   = os.getenv("MINIO_ROOT_PASSWORD","minioadmin123")
+MINIO_BUCKET = os.getenv("MINIO_BUCKET","fx-raw")
+
+_s3 = None
+
+
+def _client():
+    global _s3
+    if _s3 is None:
+        import boto3
+        from botocore.config import Config
+        _s3 = boto3.client("s3", endpoint_url=MINIO_EP, aws_access_key_id=MINIO_USER,
+                           aws_secret_access_key=MINIO_PASS, region_name="us-east-1",
+                           config=Config(connect_timeout=3, read_timeout=30, retries={"max_attempts": 2}))
+    return _s3
+
+
+def _get(key):
+    """-> bytes, 없으면 None"""
+    if CKPT_DIR:
+        path = os.path.join(CKPT_DIR, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    s3 = _client()
+    try:
+        return s3.get_object(Bucket=MINIO_BUCKET, Key=key)["Body"].read()
+    except s3.exceptions.NoSuchKey:
+        return None
+
+
+def _put(key, data):
+    if CKPT_DIR:
+        path = os.path.join(CKPT_DIR, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return
+    _client().put_object(Bucket=MINIO_BUCKET, Key=key, Body=data)
+
+
+def prefix(pair, model, ctx, h):
+    return f"{CKPT_PREFIX}/{pair}/{model}/ctx{ctx}_h{h}"
+
+
+def data_hash(series, dates=None):
+    """학습 데이터 지문 (가격 + 날짜). 과거 값이 정정돼도 바뀐다."""
+    m = hashlib.sha1(np.ascontiguousarray(series, dtype=np.float64).tobytes())
+    if dates is not None:
+        m.update(np.asarray(dates, dtype="datetime64[D]").astype(np.int64).tobytes())
+    return m.hexdigest()[:16]
+
+
+def load_latest(pair, model, ctx, h):
+    """latest 체크포인트 payload(dict) 또는 None"""
+    if not CKPT_ON:
+        return None
+    try:
+        import torch
+        p = prefix(pair, model, ctx, h)
+        ptr = _get(f"{p}/latest.json")
+        if ptr is None:
+            return None
+        raw = _get(f"{p}/{json.loads(ptr)['data_hash']}.pt")
+        return None if raw is None else torch.load(io.BytesIO(raw), map_location="cpu", weights_only=True)
+    except Exception as e:
+        print(f"[ckpt] load skip {pair}/{model}: {e}", flush=True)
+        return None
+
+
+def save(pair, model, ctx, h, dhash, payload):
+    """payload(dict: state_dict/params, mu, sigma, ...) 저장 + latest 포인터 갱신"""
+    if not CKPT_ON:
+        return
+    try:
+        import torch
+        p = prefix(pair, model, ctx, h)
+        payload = dict(payload, pair=pair, model=model, ctx=ctx, h=h, data_hash=dhash,
+                       saved_at=dt.datetime.utcnow().isoformat() + "Z")
+        buf = io.BytesIO()
+        torch.save(payload, buf)
+        _put(f"{p}/{dhash}.pt", buf.getvalue())
+        _put(f"{p}/latest.json", json.dumps({"data_hash": dhash, "saved_at": payload["saved_at"]}).encode())
+        print(f"[ckpt] saved {p}/{dhash}.pt", flush=True)
+    except Exception as e:
+        print(f"[ckpt] save skip {pair}/{model}: {e}", flush=True)
+
+
+def warm_start(model, ckpt, dhash):
+    """
+    torch 모델에 latest 가중치를 넣어본다.
+    반환: "same"(데이터 그대로 -> 학습 생략) | "warm"(이어서 학습) | "cold"(처음부터)
+    """
+    if ckpt is None or "state_dict" not in ckpt:
+        return "cold"
+    try:
+        model.load_state_dict(ckpt["state_dict"])
+    except Exception as e:   # 구조가 바뀐 경우(hidden 크기 등)
+        print(f"[ckpt] incompatible checkpoint, cold start: {e}", flush=True)
+        return "cold"
+    return "same" if ckpt.get("data_hash") == dhash else "warm"
@@ -0,0 +1,67 @@
+"""
+DLinear (Zeng et al., 2023): 이동평균으로 입력 윈도우를 trend / seasonal 로 나누고
+각각 Linear(CTX -> H) 를 태워 더한다.
+
+  trend    = moving_avg(x, k)   (양 끝은 첫/끝 값으로 padding 해서 길이 유지)
+  seasonal = x - trend
+  y        = Linear_s(seasonal) + Linear_t(trend)
+
+- 이동평균은 cumsum 으로 배치 전체 [B, CTX] 를 한 번에 계산 (윈도우별 루프 없음, O(B*CTX))
+- 모델 전체가 x 에 대해 선형이라 DLINEAR_SOLVER=lstsq|ridge 면 가중치를 바로 푼다 (fit_closed_form)
+  seasonal + trend = x 라서 [seasonal | trend] 특징은 rank 가 부족함 (lstsq 가 float32 반올림 오차까지
+  맞추느라 가중치가 폭주) -> x 로 Linear 하나를 풀고 같은 W 를 양쪽에 넣는다 (W·s + W·t = W·x, 정확히 같음)
+
+env: DLINEAR_KERNEL=25 (이동평균 길이, CTX 보다 크면 CTX 이하 홀수로 줄임)
+"""
+import os
+import numpy as np
+import torch, torch.nn as nn
+import linsolve
+
+KERNEL = int(os.getenv("DLINEAR_KERNEL", "25"))
+
+
+def kernel_for(seq_len, k=None):
+    k = min(k or KERNEL, seq_len)
+    return k if k % 2 == 1 else k - 1
+
+
+def moving_avg(x, k):
+    """x: [B, L] -> 길이 k 중심 이동평균 [B, L] (cumsum 1번)"""
+    front = (k - 1) // 2
+    back = k - 1 - front
+    xp = torch.cat([x[:, :1].expand(-1, front), x, x[:, -1:].expand(-1, back)], dim=1)
+    c = torch.cumsum(xp, dim=1)
+    c = torch.cat([torch.zeros_like(c[:, :1]), c], dim=1)
+    return (c[:, k:] - c[:, :-k]) / k
+
+
+def series_decomp(x, k):
+    """x: [B, L] -> (seasonal, trend)"""
+    trend = moving_avg(x, k)
+    return x - trend, trend
+
+
+class DLinear(nn.Module):
+    def __init__(self, seq_len, pred_len, kernel=None):
+        super().__init__()
+        self.seq_len  = seq_len
+        self.pred_len = pred_len
+        self.kernel   = kernel_for(seq_len, kernel)
+        self.linear_seasonal = nn.Linear(seq_len, pred_len)
+        self.linear_trend    = nn.Linear(seq_len, pred_len)
+
+    def forward(self, x):            # x: [B, seq_len]
+        seasonal, trend = series_decomp(x, self.kernel)
+        return self.linear_seasonal(seasonal) + self.linear_trend(trend)   # -> [B, pred_len]
+
+    def fit_closed_form(self, X, Y, solver=None):
+        """
+        X: [N, seq_len], Y: [N, pred_len] (tensor/ndarray) -> x 에 대한 Linear 하나를 풀어서
+        같은 W 를 linear_seasonal / linear_trend 양쪽에 채움 (bias 는 seasonal 쪽에만)
+        """
+        X = np.asarray(torch.as_tensor(X, dtype=torch.float32))
+        W, b = linsolve.fit_linear(X, np.asarray(Y), solver)
+        linsolve.load_linear(self.linear_seasonal, W, b)
+        linsolve.load_linear(self.linear_trend, W, np.zeros_like(b))
+        return self
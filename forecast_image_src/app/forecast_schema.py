@@ -0,0 +1,322 @@
+"""
+fx_forecast 통합 테이블 DDL / 파티션 / 이관 (forecast_writer.py 가 사용)
+
+- 키: (pair, model, horizon, origin_date, target_date)
+    model       : 베이스 모델 이름 (dlinear/lstm/gru/arima)
+    horizon     : 모델의 예측 길이 H (h5 모델이면 5)
+    origin_date : 예측 시점의 마지막 관측일, target_date : 예측 대상일 (origin + 1..H)
+- origin_date 기준 월 단위 RANGE 파티션 -> 오래된 달은 DROP TABLE fx_forecast_YYYYMM 로 바로 정리,
+  기간 조건 쿼리는 파티션 프루닝. 파티션은 쓰기 직전에 필요한 달만 생성
+- horizon 이 몇이든 새 DDL 없이 저장. 예전 테이블 이름은 호환 뷰로 유지:
+    fx_forecast_daily / fx_forecast_h5 / fx_forecast_h7 / fx_forecast_long (H 가 1/5/7 이 아닌 것)
+    (kst_date, pair, model='lstmh5' 형식, y_true, y_pred, yhat_lo, yhat_hi, run_ts)
+    = target_date 마다 가장 최근 origin 의 예측 (예전 테이블이 UPSERT 로 덮어쓰던 것과 같은 결과)
+- fx_forecast_h5/h7_latest(_pivot) 는 materialized view (LATEST_MV), 예측 저장 후 refresh_latest 로 갱신
+  피벗 컬럼은 모델 레지스트리(fx_model_registry)로 생성 (sync_pivots) -> 모델 추가에 SQL 수정 불필요
+
+기존 fx_forecast_daily/h5/h7/long 테이블, 일반 뷰 *_latest(_pivot) 는 `python forecast_schema.py` 로 이관한다.
+sql/forecast_h_multi.sql 의 *_latest / 레지스트리 정의도 LATEST_MV / REGISTRY_DDL 과 동일하게 유지할 것.
+"""
+import re
+from datetime import date, timedelta
+from sqlalchemy import text
+
+LEGACY = {"fx_forecast_daily": "horizon = 1", "fx_forecast_h5": "horizon = 5",
+          "fx_forecast_h7": "horizon = 7", "fx_forecast_long": "horizon NOT IN (1, 5, 7)"}
+LEGACY_H = {"fx_forecast_daily": 1, "fx_forecast_h5": 5, "fx_forecast_h7": 7}
+
+FORECAST_DDL = """
+CREATE TABLE IF NOT EXISTS fx_forecast (
+  pair        text NOT NULL,
+  model       text NOT NULL,
+  horizon     int  NOT NULL,
+  origin_date date NOT NULL,
+  target_date date NOT NULL,
+  y_pred      double precision,
+  y_true      double precision,   -- origin_date 의 실제값 (예측 시점 마지막 가격)
+  yhat_lo     double precision,
+  yhat_hi     double precision,
+  run_ts      timestamptz DEFAULT now(),
+  PRIMARY KEY (pair, model, horizon, origin_date, target_date)
+) PARTITION BY RANGE (origin_date);
+
+CREATE INDEX IF NOT EXISTS fx_forecast_target ON fx_forecast (horizon, target_date, pair, model, origin_date DESC);
+CREATE INDEX IF NOT EXISTS fx_forecast_run ON fx_forecast (horizon, pair, run_ts);
+
+CREATE OR REPLACE FUNCTION fx_forecast_ensure_partition(month_start date) RETURNS void AS $$
+DECLARE
+  part text := format('fx_forecast_%s', to_char(month_start, 'YYYYMM'));
+BEGIN
+  IF to_regclass(part) IS NULL THEN
+    EXECUTE format('CREATE TABLE %I PARTITION OF fx_forecast FOR VALUES FROM (%L) TO (%L)',
+                   part, month_start, (month_start + interval '1 month')::date);
+  END IF;
+EXCEPTION WHEN duplicate_table THEN
+  NULL;  -- 다른 잡이 먼저 만든 경우
+END $$ LANGUAGE plpgsql;
+"""
+
+COMPAT_VIEW = """
+CREATE OR REPLACE VIEW {name} AS
+SELECT DISTINCT ON (f.target_date, f.pair, f.model, f.horizon)
+       f.target_date AS kst_date, f.pair,
+       CASE WHEN f.horizon = 1 THEN f.model ELSE f.model || 'h' || f.horizon END AS model,
+       f.y_true, f.y_pred, f.yhat_lo, f.yhat_hi, f.run_ts
+FROM fx_forecast f
+WHERE f.{cond}
+ORDER BY f.target_date, f.pair, f.model, f.horizon, f.origin_date DESC
+"""
+
+# 대시보드용 "최신 실행" 결과: 예전 *_latest / *_latest_pivot 뷰(매 조회마다 MAX(run_ts) 집계 + GROUP BY)를
+# 같은 이름의 materialized view 로. 예측 저장 직후 refresh_latest 가 CONCURRENTLY 로 갱신 (읽기 안 막음)
+# -> 패널은 인덱스 조회만. CURRENT_DATE 는 refresh 시점 기준 (매일 예측 실행 때 갱신)
+LATEST_H = (5, 7)
+
+LATEST_MV = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS fx_forecast_h{h}_latest AS
+WITH last_run AS (
+  SELECT pair, MAX(run_ts) AS max_run_ts
+  FROM fx_forecast
+  WHERE horizon = {h} AND target_date >= CURRENT_DATE
+  GROUP BY pair
+)
+SELECT DISTINCT ON (f.pair, f.model, f.target_date)
+       f.target_date AS kst_date, f.pair, f.model || 'h{h}' AS model,
+       f.y_true, f.y_pred, f.yhat_lo, f.yhat_hi, f.run_ts
+FROM fx_forecast f
+JOIN last_run r ON f.pair = r.pair AND f.run_ts = r.max_run_ts
+WHERE f.horizon = {h} AND f.target_date >= CURRENT_DATE
+ORDER BY f.pair, f.model, f.target_date, f.origin_date DESC;
+CREATE UNIQUE INDEX IF NOT EXISTS fx_forecast_h{h}_latest_key ON fx_forecast_h{h}_latest (pair, model, kst_date);
+CREATE INDEX IF NOT EXISTS fx_forecast_h{h}_latest_run ON fx_forecast_h{h}_latest (pair, run_ts);
+"""
+
+# 피벗(pair, kst_date 당 1행, 모델별 yhat_<model>h<H> 컬럼)은 모델 레지스트리로 생성 (sync_pivots)
+# 예측을 저장한 베이스 모델은 자동 등록, enabled=false 면 피벗에서 빠짐, sort_order 로 컬럼 순서
+REGISTRY_DDL = """
+CREATE TABLE IF NOT EXISTS fx_model_registry (
+  model      text PRIMARY KEY,          -- 베이스 모델 이름 (fx_forecast.model)
+  enabled    boolean NOT NULL DEFAULT true,
+  sort_order int NOT NULL DEFAULT 100,
+  created_at timestamptz DEFAULT now()
+);
+INSERT INTO fx_model_registry (model, sort_order)
+VALUES ('dlinear', 1), ('gru', 2), ('lstm', 3), ('arima', 4)
+ON CONFLICT (model) DO NOTHING;
+"""
+
+REGISTER_SQL = """
+INSERT INTO fx_model_registry (model)
+SELECT DISTINCT m FROM unnest(CAST(:models AS text[])) AS m
+ON CONFLICT (model) DO NOTHING
+"""
+
+ENSURE_PARTITIONS_SQL = "SELECT fx_forecast_ensure_partition(m) FROM unnest(CAST(:months AS date[])) AS m"
+
+# 이 프로세스에서 이미 만들어진 것을 확인한 파티션(월 1일)
+_known_months = set()
+_schema_ok = False
+
+
+def _month(d):
+    return date(d.year, d.month, 1)
+
+
+def legacy_tables(conn):
+    """아직 일반 테이블로 남아있는 예전 예측 테이블 이름들"""
+    rows = conn.execute(text("""
+      SELECT c.relname FROM pg_class c
+      WHERE c.relname = ANY(:names) AND c.relkind = 'r' AND pg_table_is_visible(c.oid)
+    """), {"names": list(LEGACY)}).fetchall()
+    return [r[0] for r in rows]
+
+
+def ensure_schema(conn):
+    """프로세스당 1번: 통합 테이블/함수/호환 뷰 (예전 테이블이 남아있으면 이관부터 하라고 에러)"""
+    global _schema_ok
+    if _schema_ok:
+        return
+    legacy = legacy_tables(conn)
+    if legacy:
+        raise RuntimeError(f"{', '.join(legacy)} still plain tables; run `python forecast_schema.py` first")
+    conn.execute(text(FORECAST_DDL))
+    for name, cond in LEGACY.items():
+        conn.execute(text(COMPAT_VIEW.format(name=name, cond=cond)))
+    conn.execute(text(REGISTRY_DDL))
+    if not plain_latest_views(conn):
+        for h in LATEST_H:
+            conn.execute(text(LATEST_MV.format(h=h)))
+        sync_pivots(conn, refresh=False)
+    _schema_ok = True
+
+
+def registered_models(conn):
+    """피벗에 넣을 모델 (enabled, sort_order 순). 컬럼 이름으로 못 쓰는 이름은 건너뜀"""
+    models = []
+    for (m,) in conn.execute(text("SELECT model FROM fx_model_registry WHERE enabled ORDER BY sort_order, model")):
+        if re.fullmatch(r"[a-z0-9_]+", m):
+            models.append(m)
+        else:
+            print(f"[forecast_schema] skip registry model {m!r}: not a valid column name", flush=True)
+    return models
+
+
+def pivot_sql(h, models):
+    """레지스트리 모델 -> FILTER 집계 1패스 피벗 (crosstab 과 같은 결과, tablefunc 확장 불필요)"""
+    cols = "".join(f"  MAX(y_pred) FILTER (WHERE model = '{m}h{h}') AS yhat_{m}h{h},\n" for m in models)
+    return (f"CREATE MATERIALIZED VIEW fx_forecast_h{h}_latest_pivot AS\n"
+            f"SELECT\n  pair,\n{cols}  kst_date\n"
+            f"FROM fx_forecast_h{h}_latest\nGROUP BY pair, kst_date;\n"
+            f"CREATE UNIQUE INDEX fx_forecast_h{h}_latest_pivot_key ON fx_forecast_h{h}_latest_pivot (pair, kst_date);")
+
+
+def sync_pivots(conn, refresh=True):
+    """
+    *_latest_pivot 을 레지스트리에 맞춘다: 컬럼 구성이 같으면 CONCURRENTLY refresh,
+    모델이 추가/제외됐거나 아직 없으면 DROP + CREATE (같은 트랜잭션이라 읽는 쪽은 이전/새 것 중 하나만 봄)
+    """
+    models = registered_models(conn)
+    for h in LATEST_H:
+        name = f"fx_forecast_h{h}_latest_pivot"
+        want = ["pair"] + [f"yhat_{m}h{h}" for m in models] + ["kst_date"]
+        have = [r[0] for r in conn.execute(text("""
+          SELECT attname FROM pg_attribute
+          WHERE attrelid = to_regclass(:n) AND attnum > 0 AND NOT attisdropped ORDER BY attnum
+        """), {"n": name})]
+        if have == want:
+            if refresh:
+                conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+            continue
+        conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {name}"))
+        conn.execute(text(pivot_sql(h, models)))
+        print(f"[forecast_schema] rebuilt {name}: {len(models)} models", flush=True)
+
+
+def latest_names():
+    """*_latest / *_latest_pivot 이름 (피벗이 latest 뒤)"""
+    return [n for h in LATEST_H for n in (f"fx_forecast_h{h}_latest", f"fx_forecast_h{h}_latest_pivot")]
+
+
+def plain_latest_views(conn):
+    """아직 일반 뷰로 남아있는 *_latest / *_latest_pivot (forecast_schema.py 이관 전)"""
+    rows = conn.execute(text("""
+      SELECT c.relname FROM pg_class c
+      WHERE c.relname = ANY(:names) AND c.relkind = 'v' AND pg_table_is_visible(c.oid)
+    """), {"names": latest_names()}).fetchall()
+    return [r[0] for r in rows]
+
+
+def refresh_latest(eng):
+    """
+    예측 저장 후: materialized *_latest CONCURRENTLY refresh -> 피벗은 레지스트리에 맞춰 refresh/재생성
+    (이관 전 일반 뷰면 skip)
+    """
+    with eng.begin() as conn:
+        if plain_latest_views(conn):
+            return 0
+        for h in LATEST_H:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY fx_forecast_h{h}_latest"))
+        sync_pivots(conn)
+    return len(LATEST_H)
+
+
+def ensure_partitions(conn, origin_dates):
+    """origin_date 들이 걸치는 달 중 아직 확인 안 한 달의 파티션 생성 -> 만든 달 리스트 (COMMIT 후 remember_months)"""
+    months = sorted({_month(d) for d in origin_dates} - _known_months)
+    if months:
+        conn.execute(text(ENSURE_PARTITIONS_SQL), {"months": months})
+    return months
+
+
+def remember_months(months):
+    _known_months.update(months)
+
+
+# ---------- 기존 테이블 이관 ----------
+# origin_date 는 예전 테이블에 없어서 추정: H=1 은 kst_date-1 (정확), 그 외는 실행일(KST)-1 을
+# [kst_date-H, kst_date-1] 로 자른 값. target_date 마다 행이 1개뿐이라 호환 뷰 결과는 원래와 같다.
+MIGRATE_COPY = """
+INSERT INTO fx_forecast (pair, model, horizon, origin_date, target_date, y_pred, y_true, yhat_lo, yhat_hi, run_ts)
+SELECT pair, base, h,
+       LEAST(kst_date - 1, GREATEST(kst_date - h, COALESCE((run_ts AT TIME ZONE 'Asia/Seoul')::date - 1, kst_date - h))),
+       kst_date, y_pred, y_true, yhat_lo, yhat_hi, run_ts
+FROM (
+  SELECT l.*, x.h,
+         CASE WHEN x.h <> 1 AND l.model LIKE ('%h' || x.h) THEN left(l.model, -length('h' || x.h)) ELSE l.model END AS base
+  FROM {legacy} l
+  CROSS JOIN LATERAL (SELECT COALESCE({h}, NULLIF(substring(l.model from 'h([0-9]+)$'), '')::int, 1) AS h) x
+) s
+ON CONFLICT DO NOTHING
+"""
+
+# 예전 테이블을 보던 뷰(_latest, _pivot, Superset 에서 만든 것 등)를 같은 이름의 호환 뷰로 다시 연결
+REPOINT_VIEWS = """
+DO $$
+DECLARE r record;
+BEGIN
+  FOR r IN
+    SELECT DISTINCT v.oid::regclass AS view, t.relname AS legacy
+    FROM pg_depend d
+    JOIN pg_rewrite w ON w.oid = d.objid
+    JOIN pg_class v ON v.oid = w.ev_class AND v.relkind = 'v'
+    JOIN pg_class t ON t.oid = d.refobjid
+    WHERE t.relname LIKE 'fx_forecast_%_legacy' AND v.oid <> t.oid
+  LOOP
+    EXECUTE format('CREATE OR REPLACE VIEW %s AS %s', r.view,
+                   replace(pg_get_viewdef(r.view), r.legacy, replace(r.legacy, '_legacy', '')));
+  END LOOP;
+END $$;
+"""
+
+DEPENDENT_VIEWS = """
+SELECT DISTINCT v.oid::regclass::text
+FROM pg_depend d
+JOIN pg_rewrite w ON w.oid = d.objid
+JOIN pg_class v ON v.oid = w.ev_class
+JOIN pg_class t ON t.oid = d.refobjid
+WHERE t.relname = ANY(:names) AND v.oid <> t.oid AND NOT v.relname = ANY(:names)
+"""
+
+
+def migrate(eng):
+    """예전 fx_forecast_daily/h5/h7/long 테이블 -> fx_forecast (+ 호환 뷰) 한 트랜잭션에 이관"""
+    with eng.begin() as conn:
+        legacy = legacy_tables(conn)
+        for name in legacy:
+            conn.execute(text(f"ALTER TABLE {name} RENAME TO {name}_legacy"))
+            conn.execute(text(f"ALTER INDEX IF EXISTS {name}_pkey RENAME TO {name}_legacy_pkey"))
+        conn.execute(text(FORECAST_DDL))
+        for name in legacy:
+            lo, hi = conn.execute(text(f"SELECT min(kst_date), max(kst_date) FROM {name}_legacy")).one()
+            if lo is not None:
+                m, months = _month(lo - timedelta(days=31)), []
+                while m <= hi:
+                    months.append(m)
+                    m = _month(m + timedelta(days=32))
+                conn.execute(text(ENSURE_PARTITIONS_SQL), {"months": months})
+            n = conn.execute(text(MIGRATE_COPY.format(legacy=f"{name}_legacy", h=LEGACY_H.get(name, "NULL")))).rowcount
+            print(f"[forecast_schema] {name}: {n} rows -> fx_forecast", flush=True)
+        for name, cond in LEGACY.items():
+            conn.execute(text(COMPAT_VIEW.format(name=name, cond=cond)))
+        if legacy:
+            conn.execute(text(REPOINT_VIEWS))
+            for name in legacy:
+                conn.execute(text(f"DROP TABLE {name}_legacy"))
+        # 일반 뷰 *_latest / *_latest_pivot -> materialized view (다른 뷰가 기대고 있으면 멈춤)
+        plain = plain_latest_views(conn)
+        if plain:
+            deps = conn.execute(text(DEPENDENT_VIEWS), {"names": latest_names()}).fetchall()
+            if deps:
+                raise RuntimeError(f"views depend on {plain}: {[d[0] for d in deps]}; drop or move them first")
+            for name in reversed(latest_names()):
+                conn.execute(text(f"DROP VIEW IF EXISTS {name}"))
+        conn.execute(text(REGISTRY_DDL))
+        for h in LATEST_H:
+            conn.execute(text(LATEST_MV.format(h=h)))
+        sync_pivots(conn, refresh=False)
+        print(f"[forecast_schema] fx_forecast ready (migrated: {legacy or 'none'})", flush=True)
+
+
+if __name__ == "__main__":
+    import forecast_writer
+    migrate(forecast_writer.get_engine())
@@ -0,0 +1,100 @@
+"""
+예측 결과 저장 공용 모듈 (train_any.py / train_dlinear.py / run_all.py)
+
+- 엔진: 프로세스당 1개 (커넥션 풀 재사용, pool_pre_ping). 호출마다 create_engine/MetaData/Table 을 만들지 않음
+- 입력: run_all.collect 와 같은 결과 리스트
+    [{"pair", "model", "horizon", "pred_dates", "y_pred", "last_true", ("base", "origin_date")}, ...]
+  -> 통합 테이블 fx_forecast (forecast_schema.py, 키 (pair, model, horizon, origin_date, target_date))
+     model 은 베이스 이름('lstmh5' -> 'lstm'), origin_date 가 없으면 첫 예측일 - 1
+- 모든 모델/horizon 행을 컬럼 배열로 보내 unnest 로 펼쳐 INSERT ... ON CONFLICT 한 문장
+  -> 행/모델/horizon 수와 상관없이 DB 왕복 1번, 한 트랜잭션
+  (common/fx_schema.py 의 fx_rates UPSERT 와 같은 방식, 같은 키가 여러 번 오면 마지막 값)
+  새 달이면 그 전에 파티션 생성 1번
+- 저장한 베이스 모델은 fx_model_registry 에 자동 등록
+- 저장이 끝나면 대시보드용 materialized *_latest / *_latest_pivot 을 CONCURRENTLY refresh
+"""
+import os
+from datetime import timedelta
+from sqlalchemy import create_engine, text
+import forecast_schema
+
+PG_USER = os.getenv("POSTGRES_USER","fxuser")
+PG_PASS = os.getenv("POSTGRES_PASSWORD","fxpass123")
+PG_DB   = os.getenv("POSTGRES_DB","fxdb")
+PG_HOST = os.getenv("POSTGRES_HOST","postgres")
+PG_PORT = int(os.getenv("POSTGRES_PORT","5432"))
+
+_engine = None
+
+
+def get_engine():
+    """프로세스 공용 엔진 (처음 부를 때 1번 생성)"""
+    global _engine
+    if _engine is None:
+        dsn = f"postgresql+psycopg2://{PG_USER}:{PG_PASS}@{PG_HOST}:{PG_PORT}/{PG_DB}"
+        _engine = create_engine(dsn, pool_pre_ping=True)
+    return _engine
+
+
+def table_for(h):
+    """예전 테이블 이름 (지금은 fx_forecast 위의 호환 뷰, 읽기 전용)"""
+    return {1: "fx_forecast_daily", 5: "fx_forecast_h5", 7: "fx_forecast_h7"}.get(h, "fx_forecast_long")
+
+
+def base_model(model, h):
+    """'lstmh5' (h=5) -> 'lstm'. 접미사가 없으면 그대로"""
+    suffix = f"h{h}"
+    return model[:-len(suffix)] if h != 1 and model.endswith(suffix) else model
+
+
+UPSERT_SQL = """
+INSERT INTO fx_forecast (pair, model, horizon, origin_date, target_date, y_pred, y_true, run_ts)
+SELECT DISTINCT ON (pair, model, horizon, origin_date, target_date)
+       pair, model, horizon, origin_date, target_date, y_pred, y_true, now()
+FROM unnest(CAST(:pair AS text[]), CAST(:model AS text[]), CAST(:horizon AS int[]),
+            CAST(:origin_date AS date[]), CAST(:target_date AS date[]),
+            CAST(:y_pred AS float8[]), CAST(:y_true AS float8[]))
+     WITH ORDINALITY AS t(pair, model, horizon, origin_date, target_date, y_pred, y_true, ord)
+ORDER BY pair, model, horizon, origin_date, target_date, ord DESC
+ON CONFLICT (pair, model, horizon, origin_date, target_date) DO UPDATE
+  SET y_pred=EXCLUDED.y_pred, y_true=EXCLUDED.y_true, run_ts=EXCLUDED.run_ts
+"""
+
+
+def _day(d):
+    return d.date() if hasattr(d, "date") else d
+
+
+def save(results, eng=None):
+    """결과 리스트 전체를 한 문장으로 UPSERT -> 저장한 행 수 (y_pred 가 NaN/None 인 칸은 스킵)"""
+    cols = {k: [] for k in ("pair", "model", "horizon", "origin_date", "target_date", "y_pred", "y_true")}
+    for r in results:
+        h = int(r["horizon"])
+        base = r.get("base") or base_model(r["model"], h)
+        dates = [_day(d) for d in r["pred_dates"]]
+        origin = _day(r["origin_date"]) if r.get("origin_date") is not None else dates[0] - timedelta(days=1)
+        y_true = None if r.get("last_true") is None else float(r["last_true"])
+        for d, y in zip(dates, r["y_pred"]):
+            try:
+                y = float(y)
+            except (TypeError, ValueError):
+                continue
+            if y != y:   # NaN
+                continue
+            cols["pair"].append(r["pair"])
+            cols["model"].append(base)
+            cols["horizon"].append(h)
+            cols["origin_date"].append(origin)
+            cols["target_date"].append(d)
+            cols["y_pred"].append(y)
+            cols["y_true"].append(y_true)
+    if not cols["y_pred"]:
+        return 0
+    with (eng or get_engine()).begin() as conn:
+        forecast_schema.ensure_schema(conn)
+        months = forecast_schema.ensure_partitions(conn, cols["origin_date"])
+        n = conn.execute(text(UPSERT_SQL), cols).rowcount
+        conn.execute(text(forecast_schema.REGISTER_SQL), {"models": sorted(set(cols["model"]))})
+    forecast_schema.remember_months(months)
+    forecast_schema.refresh_latest(eng or get_engine())
+    return n
@@ -0,0 +1,98 @@
+"""
+추론 전용 경로 (python run_all.py infer / RUN_MODE=infer) -- 학습 없이 예측만
+
+- 모델: ckpt 저장소의 latest 체크포인트 (state_dict / ARIMA params + 학습 때 mu/sigma)
+  -> eval 모드로 고정, 프로세스 안 LRU 캐시 (MODEL_CACHE_MAX 개, 같은 프로세스에서 다시 부르면 재로드 없음)
+- 데이터: fx_features_daily 에서 pair 당 마지막 CTX 개만 읽음 (전체 시리즈 X)
+- dlinear/lstm/gru 는 forward 1번 (direct 헤드), arima 는 저장된 파라미터로 마지막 CTX 구간 filter
+  (최적화 없음)
+- 학습(run_all.py train)은 가끔 돌리는 별도 잡, 장중 재예측은 이 경로로 ms 단위
+"""
+import os, threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+import train_any as ta
+import ckpt
+
+MODEL_CACHE_MAX = int(os.getenv("MODEL_CACHE_MAX","32"))
+
+_models = OrderedDict()   # (pair, base, h) -> {"model", "mu", "sigma", "ckpt"}  (LRU: 끝이 최근)
+_models_lock = threading.Lock()
+
+
+def load_tail(eng, pair, n=None):
+    """pair 의 마지막 n(=CTX) 개 (kst_date 오름차순)"""
+    sql = """
+    SELECT kst_date, price
+    FROM fx_features_daily
+    WHERE pair = :pair
+      AND price IS NOT NULL
+    ORDER BY kst_date DESC
+    LIMIT :n
+    """
+    df = pd.read_sql(text(sql), eng, params={"pair": pair, "n": n or ta.CTX})
+    df = df.iloc[::-1].reset_index(drop=True)
+    df["kst_date"] = pd.to_datetime(df["kst_date"])
+    return df
+
+
+def load_model(pair, base, h):
+    """
+    h 스텝 예측용 고정 모델. run_all train 과 같은 키(ctx, out_len(h))로 찾는다.
+    체크포인트가 없으면 LookupError.
+    """
+    key = (pair, base, h)
+    with _models_lock:
+        if key in _models:
+            _models.move_to_end(key)
+            return _models[key]
+    if base == "arima":
+        c = ckpt.load_latest(pair, "arima", 0, 0)
+    else:
+        c = ckpt.load_latest(pair, base, ta.CTX, ta.out_len(h))
+    if c is None:
+        raise LookupError(f"no checkpoint for {pair}/{base} (ctx={ta.CTX}, h={ta.out_len(h)})")
+
+    model = None
+    if base == "dlinear":
+        from dlinear import DLinear
+        model = DLinear(ta.CTX, c["h"], kernel=c.get("kernel"))
+    elif base in ("lstm", "gru"):
+        model = ta.make_rnn(base, c["h"], hidden=c.get("hidden", 32))
+    elif base != "arima":
+        raise ValueError(f"unsupported MODEL base: {base}")
+    if model is not None:
+        model.load_state_dict(c["state_dict"])
+        model.eval()
+        for p in model.parameters():
+            p.requires_grad_(False)
+    entry = {"model": model, "mu": c.get("mu"), "sigma": c.get("sigma"), "ckpt": c}
+    with _models_lock:
+        _models[key] = entry
+        while len(_models) > MODEL_CACHE_MAX:
+            _models.popitem(last=False)
+    return entry
+
+
+def evict(pair=None):
+    """새 체크포인트를 다시 읽게 캐시 비우기 (pair 지정 시 그 pair 만)"""
+    with _models_lock:
+        for key in [k for k in _models if pair is None or k[0] == pair]:
+            del _models[key]
+
+
+def predict(entry, base, prices, h):
+    """prices: 마지막 CTX 개 원 스케일 가격 -> h 스텝 예측 (원 스케일)"""
+    prices = np.asarray(prices, dtype=float)
+    if base == "arima":
+        from statsmodels.tsa.arima.model import ARIMA
+        c = entry["ckpt"]
+        res = ARIMA(prices, order=tuple(c["order"])).filter(np.asarray(c["params"]))
+        return np.asarray(res.forecast(steps=h), dtype=float)
+    if len(prices) < ta.CTX:
+        raise ValueError(f"need {ta.CTX} points, got {len(prices)}")
+    mu, sigma = entry["mu"], entry["sigma"]
+    s = ((prices - mu) / sigma).astype(np.float32)
+    return ta.forecast(entry["model"], s, mu, sigma, h, rnn=base != "dlinear")
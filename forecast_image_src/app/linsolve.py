@@ -0,0 +1,55 @@
+"""
+DLinear(= nn.Linear 하나) 가중치를 NumPy 로 바로 푸는 solver (DLINEAR_SOLVER)
+
+  adam   : 기존처럼 torch Adam 으로 EPOCHS 만큼 학습
+  lstsq  : min ||[X 1] W - Y||^2  -> np.linalg.lstsq (SVD, 최소노름 해)
+  ridge  : min ||X W + b - Y||^2 / N + alpha ||W||^2  -> 정규방정식 (X'X + alpha N I) W = X'Y
+           (X, Y 를 평균 중심화해서 bias 는 규제하지 않음)
+
+가중치는 float64 로 풀고, 모델에는 load_linear() 로 넣는다.
+ridge 는 앞쪽 batch 차원을 지원해서 [P, N, CTX] 로 여러 pair 를 한 번에 풀 수 있다.
+"""
+import os
+import numpy as np
+
+SOLVER = os.getenv("DLINEAR_SOLVER", "ridge").lower()
+ALPHA  = float(os.getenv("DLINEAR_RIDGE_ALPHA", "1e-3"))
+SOLVERS = ("adam", "lstsq", "ridge")
+
+
+def fit_linear(X, Y, solver=None, alpha=None):
+    """
+    X : [..., N, CTX],  Y : [..., N, H]  (ridge 만 batch 차원 허용)
+    반환: (W [..., CTX, H], b [..., H])   ->  y_hat = X @ W + b
+    """
+    solver = solver or SOLVER
+    alpha = ALPHA if alpha is None else alpha
+    X = np.asarray(X, dtype=np.float64)
+    Y = np.asarray(Y, dtype=np.float64)
+    if Y.ndim == X.ndim - 1:
+        Y = Y[..., None]
+    if solver == "lstsq":
+        if X.ndim != 2:
+            raise ValueError("lstsq solver takes a single [N, CTX] matrix")
+        A = np.hstack([X, np.ones((len(X), 1))])
+        coef, *_ = np.linalg.lstsq(A, Y, rcond=None)
+        return coef[:-1], coef[-1]
+    if solver == "ridge":
+        x_mu = X.mean(axis=-2, keepdims=True)
+        y_mu = Y.mean(axis=-2, keepdims=True)
+        Xc, Yc = X - x_mu, Y - y_mu
+        XtX = np.swapaxes(Xc, -1, -2) @ Xc
+        XtY = np.swapaxes(Xc, -1, -2) @ Yc
+        XtX = XtX + alpha * X.shape[-2] * np.eye(X.shape[-1])
+        W = np.linalg.solve(XtX, XtY)
+        b = (y_mu - x_mu @ W)[..., 0, :]
+        return W, b
+    raise ValueError(f"DLINEAR_SOLVER must be one of {SOLVERS}: {solver}")
+
+
+def load_linear(layer, W, b):
+    """nn.Linear(CTX, H) 에 fit_linear 결과를 복사 (weight 는 [H, CTX])"""
+    import torch
+    with torch.no_grad():
+        layer.weight.copy_(torch.from_numpy(np.ascontiguousarray(W.T)))
+        layer.bias.copy_(torch.from_numpy(np.asarray(b).reshape(-1)))
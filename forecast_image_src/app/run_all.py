@@ -0,0 +1,180 @@
+"""
+예측 러너: 한 프로세스에서 PAIRS × MODELS × HORIZONS 조합을 모두 실행
+
+- 시리즈는 pair 당 1번만 로드, 학습 윈도우(make_windows)도 1번만 생성
+- 베이스 모델마다 1번만 학습하고 max(HORIZONS) 만큼 예측한 뒤 h 별로 앞부분을 잘라 씀
+  (FORECAST_HEAD=direct: max(H) 출력 헤드 1개가 h1/h5/h7 을 forward 1번에,
+   recursive: 1스텝 모델을 롤링, arima 는 원래 1번 fit 으로 h 스텝)
+- dlinear 는 legacy train_dlinear.py(H 마다 Linear(CTX->H) 를 따로 학습, 라벨은 모든 H 에서 'dlinear')가 아니라
+  train_any.predict_dlinear (분해형 DLinear, 위처럼 1번 학습해서 h 별로 자름).
+  라벨도 다른 모델과 같은 규칙이라 H=5/7 은 'dlinearh5' / 'dlinearh7' 로 저장된다
+- (pair, 베이스 모델) 학습 잡은 서로 독립이라 ProcessPoolExecutor 로 코어에 나눠 돌림
+  (잡 하나가 그 모델의 모든 horizon 을 담당). 워커마다 torch.set_num_threads(TORCH_THREADS) 로
+  스레드를 고정해서 워커 x 스레드가 코어 수를 넘지 않게 함 -> 잡별 wall time 출력
+- 결과는 전부 모아서 한 문장/한 트랜잭션으로 fx_forecast_daily / h5 / h7 (/ long) 에 UPSERT (forecast_writer.py)
+
+env:
+  PAIRS=USDKRW  MODELS=dlinear,lstm,gru,arima  HORIZONS=1,5,7  (+ train_any.py 의 CTX/LR/EPOCHS/DB/MinIO)
+  RUN_WORKERS=<코어 수>   (1 이면 풀 없이 현재 프로세스에서 순서대로)
+  TORCH_THREADS=<코어 수 // RUN_WORKERS>
+  RUN_MODE=train|infer   (infer: 학습 없이 체크포인트 모델 + 마지막 CTX 개로 예측만, infer.py)
+"""
+import os, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import train_any as ta
+import forecast_writer
+
+PAIRS    = [p.strip() for p in os.getenv("PAIRS", ta.PAIR).split(",") if p.strip()]
+MODELS   = [m.strip().lower() for m in os.getenv("MODELS","dlinear,lstm,gru,arima").split(",") if m.strip()]
+HORIZONS = [int(h) for h in os.getenv("HORIZONS","1,5,7").split(",") if h.strip()]
+
+N_CPU         = os.cpu_count() or 1
+RUN_WORKERS   = int(os.getenv("RUN_WORKERS", str(N_CPU)))
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", str(max(1, N_CPU // max(1, RUN_WORKERS)))))
+
+RUN_MODE      = os.getenv("RUN_MODE", "train")   # train | infer (인자로도: run_all.py infer)
+
+# 오래 걸리는 잡부터 넣어야 마지막에 워커 하나만 남아 도는 시간이 줄어든다
+COST_ORDER = {"lstm": 0, "gru": 1, "dlinear": 2, "arima": 3}
+
+# base -> fn(series, h, win, pair)
+PREDICTORS = {
+    "dlinear": lambda series, h, win, pair: ta.predict_dlinear(series, h, win=win, pair=pair),
+    "lstm":    lambda series, h, win, pair: ta.predict_rnn(series, h, cell="lstm", win=win, pair=pair),
+    "gru":     lambda series, h, win, pair: ta.predict_rnn(series, h, cell="gru", win=win, pair=pair),
+    "arima":   lambda series, h, win, pair: ta.predict_arima(series, h, pair=pair),
+}
+
+def model_label(base, h):
+    """기존 MODEL 이름 규칙: H=1 은 'lstm', 그 외는 'lstmh5' 처럼 접미사"""
+    return base if h == 1 else f"{base}h{h}"
+
+table_for = forecast_writer.table_for
+
+def load_pair(eng, pair):
+    """pair 당 1번: 시리즈 로드 + 학습 윈도우 생성"""
+    t0 = time.perf_counter()
+    df = ta.load_series(pair, eng)
+    series = df["price"]
+    win = ta.make_windows(series, ta.out_len(max(HORIZONS)))   # direct 헤드면 [N, max(H)] 타깃
+    print(f"[load] {pair} rows={len(df)} windows={len(win[3])} ({time.perf_counter()-t0:.2f}s)", flush=True)
+    return {"series": series, "win": win,
+            "last_true": float(series.iloc[-1]), "last_date": df["kst_date"].iloc[-1]}
+
+def init_worker(n_threads):
+    """풀 워커 시작 시 1번: torch 스레드 고정 (워커끼리 코어를 뺏지 않도록)"""
+    import torch
+    torch.set_num_threads(n_threads)
+
+def run_job(pair, base, h_max, series, win):
+    """(pair, base) 잡 1개: 1번 학습해서 h_max 스텝 예측 -> (pair, base, y_full, wall_s, pid)"""
+    t0 = time.perf_counter()
+    y_full = PREDICTORS[base](series, h_max, win, pair)
+    return pair, base, y_full, time.perf_counter() - t0, os.getpid()
+
+def run_jobs(data):
+    """모든 (pair, base) 잡 실행 -> {(pair, base): y_full}"""
+    h_max = max(HORIZONS)
+    jobs = sorted(((pair, base) for pair in data for base in MODELS), key=lambda j: COST_ORDER.get(j[1], 0))
+    n_workers = max(1, min(RUN_WORKERS, len(jobs)))
+    print(f"[sched] {len(jobs)} jobs on {n_workers} workers x {TORCH_THREADS} torch threads", flush=True)
+
+    out, busy = {}, 0.0
+    def done(pair, base, y_full, wall, pid):
+        nonlocal busy
+        out[(pair, base)] = y_full
+        busy += wall
+        print(f"[fit] {pair} {base} h<= {h_max} ({wall:.2f}s, pid={pid})", flush=True)
+
+    t0 = time.perf_counter()
+    if n_workers == 1:
+        for pair, base in jobs:
+            done(*run_job(pair, base, h_max, data[pair]["series"], data[pair]["win"]))
+    else:
+        # BLAS(OpenMP) 스레드도 워커 몫으로 제한 (spawn 워커는 시작 시 환경변수를 읽음)
+        os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_THREADS))
+        with ProcessPoolExecutor(n_workers, mp_context=mp.get_context("spawn"),
+                                 initializer=init_worker, initargs=(TORCH_THREADS,)) as pool:
+            futs = [pool.submit(run_job, pair, base, h_max, data[pair]["series"], data[pair]["win"])
+                    for pair, base in jobs]
+            for f in as_completed(futs):
+                done(*f.result())
+    wall = time.perf_counter() - t0
+    print(f"[sched] jobs wall={wall:.2f}s sum(job)={busy:.2f}s speedup=x{busy / max(wall, 1e-9):.1f}", flush=True)
+    return out
+
+def collect(data, fits):
+    """베이스 모델 결과를 horizon 별로 잘라 (pair, model, horizon) 결과 리스트로"""
+    results = []
+    for pair, d in data.items():
+        for base in MODELS:
+            y_full = fits.get((pair, base))
+            if y_full is None:   # infer 에서 체크포인트가 없던 모델
+                continue
+            for h in HORIZONS:
+                results.append({
+                    "pair": pair, "model": model_label(base, h), "base": base, "horizon": h,
+                    "origin_date": d["last_date"],
+                    "pred_dates": ta.make_dates(d["last_date"], h), "y_pred": y_full[:h],
+                    "last_true": d["last_true"],
+                })
+    return results
+
+def save_all(eng, results):
+    """모든 (pair, model, horizon) 결과를 UPSERT 한 문장으로, 한 트랜잭션에 (forecast_writer.py)"""
+    return forecast_writer.save(results, eng)
+
+def upload_all(results):
+    for r in results:
+        out = pd.DataFrame({"kst_date": r["pred_dates"], "pair": r["pair"], "model": r["model"],
+                            "y_true": r["last_true"], "y_pred": r["y_pred"]})
+        path = f"/tmp/forecast_{r['pair']}_{r['model']}.csv"
+        out.to_csv(path, index=False)
+        ta.upload_minio(path, r["model"], pair=r["pair"])
+
+def run_infer(eng):
+    """학습 없이 체크포인트 모델로 예측 (infer.py): pair 당 마지막 CTX 개만 읽음"""
+    import infer
+    h_max = max(HORIZONS)
+    data, fits = {}, {}
+    for pair in PAIRS:
+        t0 = time.perf_counter()
+        df = infer.load_tail(eng, pair)
+        data[pair] = {"last_true": float(df["price"].iloc[-1]), "last_date": df["kst_date"].iloc[-1]}
+        for base in MODELS:
+            t1 = time.perf_counter()
+            try:
+                entry = infer.load_model(pair, base, h_max)
+            except LookupError as e:
+                print(f"[infer] skip {pair} {base}: {e}", flush=True)
+                continue
+            fits[(pair, base)] = infer.predict(entry, base, df["price"].values, h_max)
+            print(f"[infer] {pair} {base} h<= {h_max} ({(time.perf_counter()-t1)*1000:.1f}ms)", flush=True)
+        print(f"[infer] {pair} rows={len(df)} ({time.perf_counter()-t0:.2f}s)", flush=True)
+    return collect(data, fits)
+
+def main(mode=None):
+    mode = (mode or RUN_MODE).lower()
+    t0 = time.perf_counter()
+    print(f"[runner] mode={mode} PAIRS={PAIRS} MODELS={MODELS} HORIZONS={HORIZONS} CTX={ta.CTX} EPOCHS={ta.EPOCHS}", flush=True)
+    for base in MODELS:
+        if base not in PREDICTORS:
+            raise ValueError(f"unsupported MODEL base: {base}")
+    eng = ta.get_engine()
+    if mode == "infer":
+        results = run_infer(eng)
+    elif mode == "train":
+        data = {pair: load_pair(eng, pair) for pair in PAIRS}
+        results = collect(data, run_jobs(data))
+    else:
+        raise ValueError(f"mode must be train or infer: {mode}")
+    n = save_all(eng, results)
+    if ta.SAVE_TO_MINIO:
+        upload_all(results)
+    print(f"[done] {len(results)} forecasts, {n} rows in one transaction ({time.perf_counter()-t0:.2f}s)", flush=True)
+
+if __name__ == "__main__":
+    import sys
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
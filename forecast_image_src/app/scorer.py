@@ -0,0 +1,130 @@
+"""
+예측 채점 (python scorer.py) -- 실제 종가가 들어온 날짜의 예측을 채점해서 fx_forecast_scores 에 누적
+
+- fx_forecast 의 y_true 는 학습 시점 마지막 가격이라 정확도를 보려면 매번 원시 환율과 join 해야 했음
+  -> target_date 의 실제값(fx_features_daily.price)이 생긴 예측 행만 골라 실제값/오차/롤링 MAE·MAPE 를 한 번 써 둔다
+- 통합 테이블 fx_forecast 를 직접 채점 (origin_date 마다 남아 있음, 호환 뷰는 target 별 마지막 origin 만 보여서
+  h5/h7 이 사실상 1스텝 오차가 됨) -> step = target_date - origin_date (며칠 앞 예측인지) 별로 따로 집계
+- 끝난 날만: target_date < 오늘(KST). fx_features_daily 는 일봉 뷰라 오늘 값은 장중 가격이고,
+  한 번 채점한 행은 다시 안 쓰므로 오늘 것을 채점하면 장중 가격으로 고정돼 버림
+- 증분: 아직 채점 안 된 행만 (PK anti-join), 마지막 채점일 - SCORE_LOOKBACK_DAYS 이후만 스캔
+  (늦게 들어온 실제값도 이 범위 안이면 다음 실행에서 채점)
+- 롤링: 같은 (pair, model, horizon, step) 의 최근 SCORE_WINDOW_DAYS 일(달력) 창 평균, 새 행에 대해서만 계산
+- INSERT ... SELECT 1문장 (DB 안에서 join/윈도우), 한 트랜잭션
+
+env: SCORE_WINDOW_DAYS=30  SCORE_LOOKBACK_DAYS=14  (+ forecast_writer.py 의 DB)
+"""
+import os, time, datetime as dt
+from collections import Counter
+from sqlalchemy import text
+import forecast_writer
+
+WINDOW_DAYS   = int(os.getenv("SCORE_WINDOW_DAYS","30"))
+LOOKBACK_DAYS = int(os.getenv("SCORE_LOOKBACK_DAYS","14"))
+
+SCORES_DDL = """
+CREATE TABLE IF NOT EXISTS fx_forecast_scores (
+  pair         text NOT NULL,
+  model        text NOT NULL,      -- 베이스 모델 (fx_forecast 와 같음)
+  horizon      int  NOT NULL,
+  step         int  NOT NULL,      -- kst_date - origin_date (며칠 앞 예측)
+  origin_date  date NOT NULL,
+  kst_date     date NOT NULL,      -- target_date
+  y_pred       double precision,
+  y_true       double precision,   -- kst_date 의 실제 종가
+  last_obs     double precision,   -- fx_forecast 의 y_true (학습 시점 마지막 가격)
+  err          double precision,   -- y_pred - y_true
+  abs_err      double precision,
+  ape          double precision,   -- |err| / |y_true|
+  rolling_n    int,
+  rolling_mae  double precision,   -- 같은 step 의 최근 SCORE_WINDOW_DAYS 일 평균
+  rolling_mape double precision,
+  run_ts       timestamptz,        -- 예측이 쓰인 시각
+  scored_at    timestamptz DEFAULT now(),
+  PRIMARY KEY (pair, model, horizon, origin_date, kst_date)
+);
+CREATE INDEX IF NOT EXISTS fx_forecast_scores_date ON fx_forecast_scores (kst_date);
+"""
+
+# 이전 형식(호환 뷰 채점, step/origin_date 없음) -> 다시 만들 수 있는 파생 데이터라 지우고 처음부터 채점
+OLD_LAYOUT_SQL = """
+SELECT to_regclass('fx_forecast_scores') IS NOT NULL AND NOT EXISTS (
+  SELECT 1 FROM pg_attribute
+  WHERE attrelid = to_regclass('fx_forecast_scores') AND attname = 'step' AND NOT attisdropped)
+"""
+
+SCORE_SQL = """
+WITH new AS (
+  SELECT f.pair, f.model, f.horizon, f.target_date - f.origin_date AS step, f.origin_date,
+         f.target_date AS kst_date, f.y_pred, f.y_true AS last_obs, d.price AS y_true, f.run_ts
+  FROM fx_forecast f
+  JOIN fx_features_daily d ON d.pair = f.pair AND d.kst_date = f.target_date AND d.price IS NOT NULL
+  WHERE f.target_date >= :since
+    AND f.target_date < (now() AT TIME ZONE 'Asia/Seoul')::date   -- 끝난 날만 (오늘은 장중 가격)
+    AND f.y_pred IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM fx_forecast_scores s
+                    WHERE s.pair = f.pair AND s.model = f.model AND s.horizon = f.horizon
+                      AND s.origin_date = f.origin_date AND s.kst_date = f.target_date)
+),
+err AS (
+  SELECT n.*, n.y_pred - n.y_true AS err, abs(n.y_pred - n.y_true) AS abs_err,
+         abs(n.y_pred - n.y_true) / nullif(abs(n.y_true), 0) AS ape, true AS is_new
+  FROM new n
+),
+hist AS (
+  SELECT s.pair, s.model, s.horizon, s.step, s.kst_date, s.abs_err, s.ape, false AS is_new
+  FROM fx_forecast_scores s
+  WHERE s.kst_date >= (SELECT min(kst_date) FROM new) - :window
+    AND (s.pair, s.model, s.horizon, s.step) IN (SELECT DISTINCT pair, model, horizon, step FROM new)
+),
+roll AS (
+  SELECT pair, model, horizon, step, kst_date, is_new,
+         count(*)     OVER w AS rolling_n,
+         avg(abs_err) OVER w AS rolling_mae,
+         avg(ape)     OVER w AS rolling_mape
+  FROM (SELECT pair, model, horizon, step, kst_date, abs_err, ape, is_new FROM err
+        UNION ALL SELECT * FROM hist) u
+  WINDOW w AS (PARTITION BY pair, model, horizon, step ORDER BY kst_date
+               RANGE BETWEEN make_interval(days => :window - 1) PRECEDING AND CURRENT ROW)
+)
+INSERT INTO fx_forecast_scores
+  (pair, model, horizon, step, origin_date, kst_date, y_pred, y_true, last_obs, err, abs_err, ape,
+   rolling_n, rolling_mae, rolling_mape, run_ts)
+SELECT e.pair, e.model, e.horizon, e.step, e.origin_date, e.kst_date, e.y_pred, e.y_true, e.last_obs,
+       e.err, e.abs_err, e.ape, r.rolling_n, r.rolling_mae, r.rolling_mape, e.run_ts
+FROM err e
+JOIN roll r ON r.is_new AND r.pair = e.pair AND r.model = e.model AND r.horizon = e.horizon
+           AND r.step = e.step AND r.kst_date = e.kst_date
+ON CONFLICT (pair, model, horizon, origin_date, kst_date) DO NOTHING
+RETURNING horizon
+"""
+
+
+def score_all(eng):
+    """fx_forecast 에서 새로 채점 가능한 행만 채점 -> {horizon: 행 수}"""
+    with eng.begin() as conn:
+        if conn.execute(text("SELECT to_regclass('fx_forecast')")).scalar() is None:
+            print("[score] skip: no fx_forecast table", flush=True)
+            return {}
+        if conn.execute(text(OLD_LAYOUT_SQL)).scalar():
+            conn.execute(text("DROP TABLE fx_forecast_scores"))
+            print("[score] dropped old-layout fx_forecast_scores, rescoring from fx_forecast", flush=True)
+        for stmt in SCORES_DDL.strip().split(";"):
+            if stmt.strip():
+                conn.execute(text(stmt))
+        last = conn.execute(text("SELECT max(kst_date) FROM fx_forecast_scores")).scalar()
+        since = dt.date.min if last is None else last - dt.timedelta(days=LOOKBACK_DAYS)
+        rows = conn.execute(text(SCORE_SQL), {"since": since, "window": WINDOW_DAYS}).fetchall()
+    return dict(sorted(Counter(h for (h,) in rows).items()))
+
+
+def main():
+    t0 = time.perf_counter()
+    counts = score_all(forecast_writer.get_engine())
+    for h, n in counts.items():
+        print(f"[score] h={h}: {n} new rows", flush=True)
+    print(f"[done] scored {sum(counts.values())} rows -> fx_forecast_scores ({time.perf_counter()-t0:.2f}s)", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+예측 HTTP 서비스 (python serve.py) -- 배치 테이블을 기다리지 않고 그 자리에서 예측
+
+  GET /forecast?pair=USDKRW&model=lstm&h=5
+      -> {"pair", "model", "h", "last_date", "last_price", "forecast": [{"kst_date", "y_pred"}, ...], "ms"}
+  GET /reload[?pair=USDKRW]   새 체크포인트를 다시 읽도록 모델 캐시 비움 (야간 학습 후)
+  GET /health
+
+- 모델: infer.load_model (ckpt latest, LRU 캐시 MODEL_CACHE_MAX 개), 키 (pair, model, SERVE_H)
+  SERVE_H = 학습 때 max(HORIZONS) -> h <= SERVE_H 요청은 같은 모델 결과를 앞에서 잘라 씀
+- 입력: pair 별 마지막 CTX 개 일별 종가를 메모리에 유지
+    WINDOW_FEED=postgres : WINDOW_REFRESH_S 마다 fx_features_daily 의 마지막 CTX 개를 다시 읽음
+    WINDOW_FEED=kafka    : 위에 더해 Kafka 틱(pair,price,ts)으로 오늘(KST) 종가를 바로 갱신 / 날짜가 넘어가면 추가
+- 배칭: 요청을 큐에 넣고 배처 스레드가 BATCH_WAIT_MS 동안 모아서 (pair, model) 당 forward 1번,
+  윈도우가 그대로면(version 동일) 직전 결과를 그대로 돌려줌
+
+env: FORECAST_PORT=8090  SERVE_H=max(HORIZONS)  BATCH_WAIT_MS=1  WINDOW_FEED=postgres  WINDOW_REFRESH_S=30
+     (+ run_all.py 의 PAIRS/MODELS/HORIZONS: 시작할 때 미리 로드, train_any.py 의 CTX/DB, ckpt.py 의 MinIO)
+"""
+import os, sys, json, time, queue, threading
+from concurrent.futures import Future
+from datetime import timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import train_any as ta
+import run_all, infer
+
+# 로컬 실행 시 repo 루트의 common/ 을 찾도록 (컨테이너에서는 /app/common 으로 마운트)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+PORT          = int(os.getenv("FORECAST_PORT","8090"))
+SERVE_H       = int(os.getenv("SERVE_H", str(max(run_all.HORIZONS))))
+BATCH_WAIT_MS = float(os.getenv("BATCH_WAIT_MS","1"))
+FEED          = os.getenv("WINDOW_FEED","postgres").lower()
+REFRESH_S     = float(os.getenv("WINDOW_REFRESH_S","30"))
+KAFKA_BOOTSTRAP = os.getenv("KAFKA_BOOTSTRAP","kafka:19092")
+KAFKA_TOPIC     = os.getenv("KAFKA_TOPIC","fx_rate_raw")
+
+KST = timezone(timedelta(hours=9))
+
+def log(*a): print(*a, flush=True)
+
+
+class Windows:
+    """pair -> (dates, prices[CTX], version). 스냅샷 튜플을 통째로 교체해서 읽는 쪽은 락 없이 사용"""
+    def __init__(self, eng):
+        self.eng = eng
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def get(self, pair):
+        snap = self.data.get(pair)
+        if snap is None:
+            self.load(pair)
+            snap = self.data[pair]
+        return snap
+
+    def load(self, pair):
+        df = infer.load_tail(self.eng, pair)
+        if df.empty:
+            raise LookupError(f"no data for pair {pair}")
+        self._set(pair, [d.date() for d in df["kst_date"]], df["price"].to_numpy(float))
+
+    def _set(self, pair, dates, prices):
+        with self.lock:
+            old = self.data.get(pair)
+            if old is not None and old[0] == dates and np.array_equal(old[1], prices):
+                return
+            self.data[pair] = (dates, prices, (old[2] + 1) if old else 0)
+
+    def on_tick(self, pair, price, ts):
+        """Kafka 틱 -> 오늘(KST) 종가 갱신, 날짜가 넘어가면 한 칸 밀기"""
+        snap = self.data.get(pair)
+        if snap is None:
+            return
+        dates, prices, _ = snap
+        if ts.tzinfo is None:
+            # ingestor 는 tz 없는 ts 를 그대로 넘기고 Postgres 세션 타임존(UTC)으로 저장됨 -> 여기서도 UTC
+            ts = ts.replace(tzinfo=timezone.utc)
+        d = ts.astimezone(KST).date()
+        if d == dates[-1]:
+            prices = prices.copy(); prices[-1] = price
+        elif d > dates[-1]:
+            dates = (dates + [d])[-ta.CTX:]
+            prices = np.append(prices, price)[-ta.CTX:]
+        else:
+            return   # 지난 날짜 틱은 Postgres 재로드 때 반영
+        self._set(pair, dates, prices)
+
+    def refresh_loop(self):
+        while True:
+            time.sleep(REFRESH_S)
+            for pair in list(self.data):
+                try:
+                    self.load(pair)
+                except Exception as e:
+                    log(f"[serve] window refresh {pair}: {e}")
+
+    def kafka_loop(self, consumer, parse_line):
+        """틱 루프. 루프 자체가 죽으면 오래된 윈도우로 조용히 서빙하지 않게 프로세스 종료 (restart 정책이 다시 띄움)"""
+        try:
+            for msg in consumer:
+                try:
+                    ts, pair, price = parse_line(msg.value)
+                    self.on_tick(pair, price, ts)
+                except Exception as e:
+                    log(f"[serve] bad tick {msg.value!r}: {e}")
+        except BaseException as e:
+            log(f"[serve] kafka feed died: {e!r} -> exit")
+        os._exit(1)
+
+
+def kafka_feed():
+    """
+    WINDOW_FEED=kafka 일 때 시작 전에 만든다 -> kafka-python / common/ 이 없거나 브로커에 못 붙으면 여기서 바로 실패.
+    틱 파서는 ingestor 와 같은 common/tick_parser.py (컨테이너에서는 /app/common 으로 마운트)
+    """
+    from kafka import KafkaConsumer
+    from common.tick_parser import parse_line
+    consumer = KafkaConsumer(KAFKA_TOPIC, bootstrap_servers=KAFKA_BOOTSTRAP, group_id=None,
+                             auto_offset_reset="latest", value_deserializer=lambda v: v.decode("utf-8"))
+    log(f"[serve] window feed: kafka {KAFKA_TOPIC} on {KAFKA_BOOTSTRAP}")
+    return consumer, parse_line
+
+
+class Batcher:
+    """요청을 모아서 (pair, model) 당 forward 1번. 결과는 윈도우 version 이 바뀔 때까지 재사용"""
+    def __init__(self, windows):
+        self.windows = windows
+        self.q = queue.Queue()
+        self.last = {}   # (pair, base) -> (version, y[SERVE_H], dates, last_price)
+        threading.Thread(target=self.loop, name="batcher", daemon=True).start()
+
+    def submit(self, pair, base, h):
+        f = Future()
+        self.q.put((pair, base, h, f))
+        return f
+
+    def loop(self):
+        while True:
+            items = [self.q.get()]
+            deadline = time.perf_counter() + BATCH_WAIT_MS / 1000
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self.q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            groups = {}
+            for pair, base, h, f in items:
+                groups.setdefault((pair, base), []).append((h, f))
+            for (pair, base), reqs in groups.items():
+                try:
+                    y, dates, last_price = self.forecast(pair, base)
+                except Exception as e:
+                    for _, f in reqs:
+                        f.set_exception(e)
+                    continue
+                for h, f in reqs:
+                    f.set_result((y[:h], dates, last_price))
+
+    def forecast(self, pair, base):
+        dates, prices, version = self.windows.get(pair)
+        hit = self.last.get((pair, base))
+        if hit is not None and hit[0] == version:
+            return hit[1:]
+        entry = infer.load_model(pair, base, SERVE_H)
+        y = infer.predict(entry, base, prices, SERVE_H)
+        out = (y, dates, float(prices[-1]))
+        self.last[(pair, base)] = (version,) + out
+        return out
+
+
+def make_handler(batcher):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            t0 = time.perf_counter()
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/health":
+                return self._send(200, {"ok": True, "models": len(infer._models), "pairs": list(batcher.windows.data)})
+            if url.path == "/reload":
+                infer.evict(q.get("pair"))
+                batcher.last.clear()
+                return self._send(200, {"ok": True})
+            if url.path != "/forecast":
+                return self._send(404, {"error": "not found"})
+            try:
+                pair = q["pair"]
+                base = q.get("model", "dlinear").lower()
+                h = int(q.get("h", "1"))
+                if base not in run_all.PREDICTORS:
+                    raise ValueError(f"unsupported model: {base}")
+                if not 1 <= h <= SERVE_H:
+                    raise ValueError(f"h must be 1..{SERVE_H}")
+            except (KeyError, ValueError) as e:
+                return self._send(400, {"error": str(e)})
+            try:
+                y, dates, last_price = batcher.submit(pair, base, h).result(timeout=30)
+            except LookupError as e:
+                return self._send(404, {"error": str(e)})
+            except Exception as e:
+                return self._send(500, {"error": str(e)})
+            last = dates[-1]
+            self._send(200, {
+                "pair": pair, "model": run_all.model_label(base, h), "h": h,
+                "last_date": last.isoformat(), "last_price": last_price,
+                "forecast": [{"kst_date": (last + timedelta(days=i + 1)).isoformat(), "y_pred": float(v)}
+                             for i, v in enumerate(y)],
+                "ms": round((time.perf_counter() - t0) * 1000, 3),
+            })
+
+        def log_message(self, *a):   # 요청마다 stderr 로깅하지 않음 (지연시간)
+            pass
+    return Handler
+
+
+def warm(batcher):
+    """시작할 때 PAIRS x MODELS 를 미리 로드 (첫 요청에서 torch/statsmodels import 비용이 안 나게)"""
+    for pair in run_all.PAIRS:
+        for base in run_all.MODELS:
+            try:
+                batcher.forecast(pair, base)
+                log(f"[serve] warm {pair} {base}")
+            except Exception as e:
+                log(f"[serve] warm skip {pair} {base}: {e}")
+
+
+def main():
+    if FEED not in ("postgres", "kafka"):
+        raise SystemExit(f"[serve] unknown WINDOW_FEED={FEED} (postgres | kafka)")
+    feed = kafka_feed() if FEED == "kafka" else None
+    eng = ta.get_engine()
+    windows = Windows(eng)
+    batcher = Batcher(windows)
+    warm(batcher)
+    if FEED == "kafka":
+        threading.Thread(target=windows.kafka_loop, args=feed, name="kafka-feed", daemon=True).start()
+    threading.Thread(target=windows.refresh_loop, name="pg-refresh", daemon=True).start()
+    ThreadingHTTPServer.request_queue_size = 128   # 기본 5 -> 동시 접속 몰리면 SYN 재전송(1s) 지연
+    ThreadingHTTPServer.daemon_threads = True
+    srv = ThreadingHTTPServer(("0.0.0.0", PORT), make_handler(batcher))
+    log(f"[serve] listening on :{PORT} (SERVE_H={SERVE_H}, batch_wait={BATCH_WAIT_MS}ms, feed={FEED})")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,9 @@ import os, math
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from windows import sliding, to_torch
+import linsolve, ckpt, forecast_writer
 
 # ----------------- ENV -----------------
 MODEL = os.getenv('MODEL','dlinear').lower()   # ex) dlinear, dlinearh5, dlinearh7, lstm, lstmh5, lstmh7, gru, gruh5, gruh7, arima, arimah5, arimah7
@@ -10,11 +12,7 @@ PAIR  = os.getenv('PAIR','USDKRW')
 CTX   = int(os.getenv('CTX','96'))
 H     = int(os.getenv('H','1'))
 
-PG_USER = os.getenv("POSTGRES_USER","fxuser")
-PG_PASS = os.getenv("POSTGRES_PASSWORD","fxpass123")
-PG_DB   = os.getenv("POSTGRES_DB","fxdb")
-PG_HOST = os.getenv("POSTGRES_HOST","postgres")
-PG_PORT = int(os.getenv("POSTGRES_PORT","5432"))
+# Postgres 접속(POSTGRES_*)은 forecast_writer.py 의 공용 엔진
 
 SAVE_TO_MINIO = os.getenv("SAVE_TO_MINIO","true").lower()=="true"
 MINIO_EP   = os.getenv("MINIO_ENDPOINT","http://minio:9000")
@@ -24,12 +22,18 @@ MINIO_BUCKET=os.getenv("MINIO_BUCKET","fx-raw")
 
 LR     = float(os.getenv("LR","1e-3"))
 EPOCHS = int(os.getenv("EPOCHS","200"))
+# direct   : 출력 H 개짜리 헤드를 [N, H] 타깃으로 학습 -> forward 1번에 H 스텝 (h1/h5/h7 을 한 모델이)
+# recursive: 1스텝 모델을 H 번 롤링 (예측을 입력에 이어붙임)
+HEAD   = os.getenv("FORECAST_HEAD","direct").lower()
+# lstm/gru 미니배치 학습 + 검증 loss 기반 early stopping (EPOCHS 는 최대 epoch)
+BATCH_SIZE = int(os.getenv("BATCH_SIZE","64"))
+PATIENCE   = int(os.getenv("PATIENCE","10"))      # 검증 loss 가 이만큼 epoch 동안 안 좋아지면 중단
+MIN_DELTA  = float(os.getenv("MIN_DELTA","1e-5"))  # 이보다 작게 줄면 개선으로 안 봄
 
 def get_engine():
-    dsn = f"postgresql+psycopg2://{PG_USER}:{PG_PASS}@{PG_HOST}:{PG_PORT}/{PG_DB}"
-    return create_engine(dsn)
+    return forecast_writer.get_engine()   # 프로세스 공용 (커넥션 풀 재사용)
 
-def load_series():
+def load_series(pair=None, eng=None):
     sql = """
     SELECT kst_date, price
     FROM fx_features_daily
@@ -37,7 +41,7 @@ def load_series():
       AND price IS NOT NULL
     ORDER BY kst_date
     """
-    df = pd.read_sql(text(sql), get_engine(), params={"pair": PAIR})
+    df = pd.read_sql(text(sql), eng or get_engine(), params={"pair": pair or PAIR})
     df["kst_date"] = pd.to_datetime(df["kst_date"])
     return df
 
@@ -49,71 +53,10 @@ def save_pg(pred_dates, y_pred, last_true, model_label):
     y_pred     : 예측값 리스트/배열
     last_true  : 마지막 실제 환율 (y_true 용)
     model_label: MODEL 환경변수 값 (예: 'arima', 'lstmh5', 'gruh7' 등)
+    H 로 테이블 결정, 모든 날짜를 한 문장으로 UPSERT (forecast_writer.py)
     """
-    import os
-    from datetime import datetime
-    from math import isnan
-    from sqlalchemy import MetaData, Table, Column, Date, String, Float, DateTime, text
-    from sqlalchemy.dialects.postgresql import insert
-
-    eng = get_engine()
-
-    # H 값에 따라 어느 테이블에 쓸지 결정
-    horizon = int(os.getenv("H", "1"))
-    if horizon == 1:
-        table_name = "fx_forecast_daily"
-    elif horizon == 5:
-        table_name = "fx_forecast_h5"
-    elif horizon == 7:
-        table_name = "fx_forecast_h7"
-    else:
-        # 나중에 10일, 30일 같은 거 추가할 때 쓸 확장용
-        table_name = "fx_forecast_long"
-
-    meta = MetaData()
-    tbl = Table(
-        table_name,
-        meta,
-        Column("kst_date", Date,    primary_key=True),
-        Column("pair",     String,  primary_key=True),
-        Column("model",    String,  primary_key=True),
-        Column("y_pred",   Float),
-        Column("y_true",   Float),
-        Column("run_ts",   DateTime),
-    )
-
-    dates = list(pred_dates)
-    preds = list(y_pred)
-
-    with eng.begin() as conn:
-        for d, y in zip(dates, preds):
-            # 값이 이상하면 스킵
-            try:
-                y_val = float(y)
-            except (TypeError, ValueError):
-                continue
-            if isnan(y_val):
-                continue
-
-            stmt = insert(tbl).values(
-                kst_date=d,
-                pair=PAIR,
-                model=model_label,
-                y_pred=y_val,
-                y_true=float(last_true) if last_true is not None else None,
-                run_ts=datetime.utcnow(),
-            )
-
-            # (kst_date, pair, model) 기준 UPSERT
-            stmt = stmt.on_conflict_do_update(
-                index_elements=["kst_date", "pair", "model"],
-                set_={
-                    "y_pred": stmt.excluded.y_pred,
-                    "y_true": stmt.excluded.y_true,
-                    "run_ts": text("NOW()"),
-                },
-            )
-            conn.execute(stmt)
+    forecast_writer.save([{"pair": PAIR, "model": model_label, "horizon": H,
+                           "pred_dates": pred_dates, "y_pred": y_pred, "last_true": last_true}])
 
 
 def make_dates(last_date, h):
@@ -125,73 +68,151 @@ def split_mu_sigma(series, split_ratio=0.8):
     sigma = float(series[:split].std() + 1e-8)
     return mu, sigma
 
-# ---------- Models ----------
-def predict_arima(series, h):
-    from statsmodels.tsa.arima.model import ARIMA
-    model = ARIMA(series.values, order=(1,1,1))
-    fit = model.fit()
-    fc = fit.forecast(steps=h)
-    return np.asarray(fc, dtype=float)
-
-def predict_dlinear(series, h):
-    # 간단 DLinear 스타일: 선형층로로 CTX 윈도우를 예측 (여기선 placeholder 형태)
-    # 이미 이미지에 학습 루틴이 있을 수 있으니, 여기서는 roll-forward로 모사
-    import torch, torch.nn as nn
-    # 표준화
+def make_windows(series, horizon=1):
+    """
+    dlinear / lstm / gru 가 같이 쓰는 학습 데이터 (한 번만 만들어서 재사용)
+    반환: (s, mu, sigma, X, Y)
+      s : 표준화된 시리즈(float32), X : [N, CTX], Y : [N, horizon] (다음 horizon 스텝)  -- X, Y 는 s 의 view
+    """
     mu, sigma = split_mu_sigma(series)
-    s = (series - mu) / sigma
-    # 학습 데이터
-    X, y = [], []
-    for i in range(CTX, len(s)):
-        X.append(s.values[i-CTX:i])
-        y.append(s.values[i])
-    X = torch.tensor(np.array(X), dtype=torch.float32).unsqueeze(-1)
-    y = torch.tensor(np.array(y), dtype=torch.float32)
-
-    class DLinear(nn.Module):
-        def __init__(self, ctx):
-            super().__init__()
-            self.fc = nn.Linear(ctx, 1)
-        def forward(self, x):
-            # x: [B,CTX,1] -> [B,1]
-            return self.fc(x.squeeze(-1)).squeeze(-1)
+    s = ((series - mu) / sigma).to_numpy(np.float32)
+    X, Y = sliding(s, CTX, horizon)
+    return s, mu, sigma, X, Y
+
+def out_len(h):
+    """모델 출력 길이: direct 면 h, recursive 면 1"""
+    if HEAD not in ("direct", "recursive"):
+        raise ValueError(f"FORECAST_HEAD must be direct or recursive: {HEAD}")
+    return h if HEAD == "direct" else 1
+
+def windows_for(series, h, win=None):
+    """넘겨받은 win 의 타깃 길이가 맞으면 재사용, 아니면 새로 (view 라 비용 거의 없음)"""
+    k = out_len(h)
+    if win is not None and win[4].shape[1] == k:
+        return win
+    return make_windows(series, k)
+
+def forecast_batch(model, S, h, rnn=False):
+    """
+    S: [B, CTX] 표준화된 입력 윈도우들 -> [B, h] 예측 (표준화 공간).
+    direct: forward 1번 / recursive: 배치째 1스텝씩 롤링. (backtest.py 는 여러 origin 을 한 배치로)
+    """
+    import torch
+    model.eval()
+    x = torch.from_numpy(np.ascontiguousarray(S, dtype=np.float32))
+    def run(x):
+        with torch.no_grad():
+            return model(x.unsqueeze(-1) if rnn else x)
+    if model.pred_len >= h:
+        return run(x)[:, :h].numpy().astype(float)
+    outs = []
+    for _ in range(h):
+        p = run(x[:, -CTX:])[:, :1]
+        outs.append(p)
+        x = torch.cat([x, p], dim=1)
+    return torch.cat(outs, dim=1).numpy().astype(float)
+
+def forecast(model, s, mu, sigma, h, rnn=False):
+    """마지막 CTX 로 h 스텝 예측 (원 스케일)"""
+    return forecast_batch(model, np.asarray(s)[-CTX:][None], h, rnn)[0] * sigma + mu
 
-    model = DLinear(CTX)
+def fit_minibatch(model, Xtr, ytr, Xva, yva, tag="model", epochs=None):
+    """
+    미니배치(BATCH_SIZE, 셔플) Adam 학습, 최대 epochs(기본 EPOCHS). 매 epoch 검증 loss 를 보고
+    PATIENCE epoch 동안 MIN_DELTA 이상 개선이 없으면 중단 -> best 가중치로 복원.
+    (시작 가중치도 epoch 0 으로 평가 -> warm start 가 fine-tune 으로 오히려 나빠지지 않게)
+    반환: (stop_epoch, best_epoch, best_val)
+    """
+    epochs = EPOCHS if epochs is None else epochs
+    import copy, torch, torch.nn as nn
+    from torch.utils.data import TensorDataset, DataLoader
+    # 윈도우 view 를 연속 메모리로 1번만 복사해 두고 매 배치는 그 안에서 슬라이스
+    # (모델/배치 모두 CPU 라 pin_memory 는 메모리/시간만 더 들어서 쓰지 않음)
+    Xtr, ytr = Xtr.contiguous(), ytr.contiguous()
+    loader = DataLoader(TensorDataset(Xtr, ytr), batch_size=BATCH_SIZE, shuffle=True)
     opt = torch.optim.Adam(model.parameters(), lr=LR)
     loss_fn = nn.MSELoss()
 
-    n = len(X); n_tr = int(n*0.8)
-    Xtr, ytr = X[:n_tr], y[:n_tr]
-    Xva, yva = X[n_tr:], y[n_tr:]
-    for e in range(1, EPOCHS+1):
-        model.train(); opt.zero_grad()
-        pred = model(Xtr)
-        loss = loss_fn(pred, ytr)
-        loss.backward(); opt.step()
-    # 롤링 예측
-    hist = s.values[-CTX:].astype(float).tolist()
-    outs = []
-    for _ in range(h):
-        x = torch.tensor(np.array(hist[-CTX:])[None,:,None], dtype=torch.float32)
+    best_val, best_epoch, best_state, e = float("inf"), 0, None, 0
+    if len(Xva):
+        model.eval()
         with torch.no_grad():
-            pn = model(x).item()
-        yhat = pn * sigma + mu
-        outs.append(yhat)
-        hist.append(pn)  # 정규화 공간으로 이어붙임
-    return np.array(outs, dtype=float)
+            best_val = loss_fn(model(Xva), yva).item()
+        best_state = copy.deepcopy(model.state_dict())
+    for e in range(1, epochs+1):
+        model.train()
+        for xb, yb in loader:
+            opt.zero_grad()
+            loss = loss_fn(model(xb), yb)
+            loss.backward(); opt.step()
+        if len(Xva) == 0:
+            continue
+        model.eval()
+        with torch.no_grad():
+            ve = loss_fn(model(Xva), yva).item()
+        if ve < best_val - MIN_DELTA:
+            best_val, best_epoch, best_state = ve, e, copy.deepcopy(model.state_dict())
+        elif e - best_epoch >= PATIENCE:
+            break
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    print(f"[{tag}] stop epoch={e}/{epochs} best epoch={best_epoch} val={best_val:.6f}", flush=True)
+    return e, best_epoch, best_val
 
-def predict_rnn(series, h, cell="lstm"):
-    import torch, torch.nn as nn
-    mu, sigma = split_mu_sigma(series)
-    s = (series - mu) / sigma
+# ---------- Models ----------
+def train_epochs(mode):
+    """ckpt.warm_start 결과 -> 학습 epoch 수 (same: 0, warm: FINETUNE_EPOCHS, cold: EPOCHS)"""
+    return {"same": 0, "warm": ckpt.FINETUNE_EPOCHS}.get(mode, EPOCHS)
 
-    X, y = [], []
-    for i in range(CTX, len(s)):
-        X.append(s.values[i-CTX:i])
-        y.append(s.values[i])
-    X = torch.tensor(np.array(X), dtype=torch.float32).unsqueeze(-1)
-    y = torch.tensor(np.array(y), dtype=torch.float32)
+def predict_arima(series, h, pair=None):
+    # arima_engine.py: 저장된 params/상태공간 상태에서 새 관측만 filter, 재추정/차수 탐색은 스케줄로만
+    import arima_engine
+    return arima_engine.forecast(series, h, pair or PAIR)
 
+def fit_dlinear(series, h, win=None, pair=None, warm=None):
+    """
+    DLinear(dlinear.py): 이동평균 trend/seasonal 분해 + 각각 Linear (출력 out_len(h) 개)
+    warm=None: ckpt 저장소에서 warm start + 저장 / dict(state_dict): 그 가중치에서 이어서 (저장 안 함)
+    반환: (model, s, mu, sigma)
+    """
+    import torch, torch.nn as nn
+    from dlinear import DLinear
+    pair = pair or PAIR
+    registry = warm is None
+    # 표준화 + 학습 데이터 (win: make_windows 결과를 넘기면 재사용)
+    s, mu, sigma, X, Y = windows_for(series, h, win)
+    X, Y = to_torch(X, Y)
+    dh = ckpt.data_hash(series)
+
+    model = DLinear(CTX, Y.shape[1])
+    n = len(X); n_tr = int(n*0.8)
+    Xtr, ytr = X[:n_tr], Y[:n_tr]
+    Xva, yva = X[n_tr:], Y[n_tr:]
+    if linsolve.SOLVER != "adam":
+        # 모델이 x 에 선형이라 정규방정식/최소제곱으로 바로 최적해 (DLINEAR_SOLVER=lstsq|ridge) -> warm start 불필요
+        model.fit_closed_form(Xtr, ytr)
+    else:
+        prev = ckpt.load_latest(pair, "dlinear", CTX, Y.shape[1]) if registry else warm
+        mode = ckpt.warm_start(model, prev, dh)
+        opt = torch.optim.Adam(model.parameters(), lr=LR)
+        loss_fn = nn.MSELoss()
+        for e in range(1, train_epochs(mode)+1):
+            model.train(); opt.zero_grad()
+            pred = model(Xtr)
+            loss = loss_fn(pred, ytr)
+            loss.backward(); opt.step()
+    if registry:
+        ckpt.save(pair, "dlinear", CTX, Y.shape[1], dh,
+                  {"state_dict": model.state_dict(), "mu": mu, "sigma": sigma, "kernel": model.kernel})
+    return model, s, mu, sigma
+
+def predict_dlinear(series, h, win=None, pair=None):
+    model, s, mu, sigma = fit_dlinear(series, h, win, pair)
+    return forecast(model, s, mu, sigma, h)
+
+def make_rnn(cell, pred_len, hidden=32):
+    """lstm/gru + 마지막 hidden -> pred_len 스텝 헤드 (학습/추론(infer.py) 공용)"""
+    import torch.nn as nn
     if cell=="lstm":
         RNN = nn.LSTM
     elif cell=="gru":
@@ -200,46 +221,48 @@ def predict_rnn(series, h, cell="lstm"):
         raise ValueError("cell must be lstm or gru")
 
     class RNNModel(nn.Module):
-        def __init__(self, hidden=32):
+        def __init__(self):
             super().__init__()
+            self.pred_len = pred_len
             self.rnn = RNN(input_size=1, hidden_size=hidden, batch_first=True)
-            self.fc = nn.Linear(hidden, 1)
+            self.fc = nn.Linear(hidden, pred_len)   # multi-output head
         def forward(self, x):
             out, _ = self.rnn(x)
-            out = self.fc(out[:,-1,:])
-            return out.squeeze(-1)
+            return self.fc(out[:,-1,:])             # [B, pred_len]
 
-    model = RNNModel()
-    opt = torch.optim.Adam(model.parameters(), lr=LR)
-    loss_fn = nn.MSELoss()
+    return RNNModel()
 
+def fit_rnn(series, h, cell="lstm", win=None, pair=None, warm=None):
+    """
+    lstm/gru 미니배치 학습 (fit_minibatch).
+    warm=None: ckpt 저장소에서 warm start + 저장 / dict(state_dict): 그 가중치에서 이어서 (저장 안 함)
+    반환: (model, s, mu, sigma)
+    """
+    pair = pair or PAIR
+    registry = warm is None
+    s, mu, sigma, X, Y = windows_for(series, h, win)
+    X, Y = to_torch(X, Y)
+    X = X.unsqueeze(-1)
+
+    model = make_rnn(cell, Y.shape[1])
     n = len(X); n_tr = int(n*0.8)
-    Xtr, ytr = X[:n_tr], y[:n_tr]
-    Xva, yva = X[n_tr:], y[n_tr:]
-
-    for e in range(1, EPOCHS+1):
-        model.train(); opt.zero_grad()
-        pred = model(Xtr)
-        loss = loss_fn(pred, ytr)
-        loss.backward(); opt.step()
-        if e % 20 == 0:
-            model.eval()
-            with torch.no_grad():
-                pv = model(Xva)
-                ve = loss_fn(pv, yva).item()
-                # print(f"[{cell}] epoch={e:03d} val={ve:.6f}")
-
-    # 롤링 예측
-    hist = s.values[-CTX:].astype(float).tolist()
-    outs = []
-    for _ in range(h):
-        x = torch.tensor(np.array(hist[-CTX:])[None,:,None], dtype=torch.float32)
-        with torch.no_grad():
-            pn = model(x).item()  # 정규화 공간
-        yhat = pn * sigma + mu
-        outs.append(yhat)
-        hist.append(pn)
-    return np.array(outs, dtype=float)
+    Xtr, ytr = X[:n_tr], Y[:n_tr]
+    Xva, yva = X[n_tr:], Y[n_tr:]
+    dh = ckpt.data_hash(series)
+    prev = ckpt.load_latest(pair, cell, CTX, Y.shape[1]) if registry else warm
+    mode = ckpt.warm_start(model, prev, dh)
+    if mode != "same":
+        fit_minibatch(model, Xtr, ytr, Xva, yva, tag=f"{cell}:{mode}", epochs=train_epochs(mode))
+        if registry:
+            ckpt.save(pair, cell, CTX, Y.shape[1], dh,
+                      {"state_dict": model.state_dict(), "mu": mu, "sigma": sigma, "hidden": model.rnn.hidden_size})
+    else:
+        print(f"[{cell}] data unchanged, reuse checkpoint", flush=True)
+    return model, s, mu, sigma
+
+def predict_rnn(series, h, cell="lstm", win=None, pair=None):
+    model, s, mu, sigma = fit_rnn(series, h, cell, win, pair)
+    return forecast(model, s, mu, sigma, h, rnn=True)
 
 # ---------- Main ----------
 def main():
@@ -279,7 +302,7 @@ def main():
 
 
 
-def upload_minio(local_csv, model_label):
+def upload_minio(local_csv, model_label, pair=None):
     """
     MinIO로 forecast CSV 업로드
     (train_any.py 전용: 모델 라벨을 인자로 받아서 파일명에 반영)
@@ -288,7 +311,7 @@ def upload_minio(local_csv, model_label):
     from dateutil.tz import gettz
     try:
         today = dt.datetime.now(gettz("Asia/Seoul")).strftime("%Y/%m/%d")
-        key = f"{today}/forecast_{PAIR}_{model_label}.csv"
+        key = f"{today}/forecast_{pair or PAIR}_{model_label}.csv"
         print(f"[minio-tip] {local_csv} -> s3://{MINIO_BUCKET}/{key}")
         os.system(
             f"mc alias set local {MINIO_EP} {MINIO_USER} {MINIO_PASS} >/dev/null 2>&1 || true && "
@@ -299,21 +322,3 @@ def upload_minio(local_csv, model_label):
 
 if __name__ == "__main__":
     main()
-
-
-def upload_minio(local_csv, model_label):
-    """
-    MinIO로 forecast CSV 업로드 (train_dlinear.py와 비슷한 방식)
-    """
-    import os, datetime as dt
-    from dateutil.tz import gettz
-    try:
-        today = dt.datetime.now(gettz("Asia/Seoul")).strftime("%Y/%m/%d")
-        key = f"{today}/forecast_{PAIR}_{model_label}.csv"
-        print(f"[minio-tip] {local_csv} -> s3://{MINIO_BUCKET}/{key}")
-        os.system(
-            f"mc alias set local {MINIO_EP} {MINIO_USER} {MINIO_PASS} >/dev/null 2>&1 || true && "
-            f"mc cp {local_csv} local/{MINIO_BUCKET}/{key} >/dev/null 2>&1 || true"
-        )
-    except Exception as e:
-        print("[minio] skip:", e)
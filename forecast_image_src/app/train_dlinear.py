@@ -1,8 +1,11 @@
 import os, math, datetime as dt
 import numpy as np, pandas as pd
 from dateutil.tz import gettz
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import torch, torch.nn as nn
+from windows import sliding, to_torch
+import linsolve, ckpt, forecast_writer
+from dlinear import DLinear   # 이동평균 trend/seasonal 분해 + Linear 2개
 
 PAIR   = os.getenv("PAIR",  "USDKRW")
 CTX    = int(os.getenv("CTX", "96"))    # 입력 윈도우 길이(96일)
@@ -11,11 +14,7 @@ EPOCHS = int(os.getenv("EPOCHS", "200"))
 LR     = float(os.getenv("LR", "1e-3"))
 MODEL  = "dlinear"
 
-PG_USER = os.getenv("POSTGRES_USER","fxuser")
-PG_PASS = os.getenv("POSTGRES_PASSWORD","fxpass123")
-PG_DB   = os.getenv("POSTGRES_DB","fxdb")
-PG_HOST = os.getenv("POSTGRES_HOST","postgres")
-PG_PORT = int(os.getenv("POSTGRES_PORT","5432"))
+# Postgres 접속(POSTGRES_*)은 forecast_writer.py 의 공용 엔진
 
 MINIO_ON   = os.getenv("SAVE_TO_MINIO","true").lower()=="true"
 MINIO_EP   = os.getenv("MINIO_ENDPOINT","http://minio:9000")
@@ -23,20 +22,8 @@ MINIO_USER = os.getenv("MINIO_ROOT_USER","minioadmin")
 MINIO_PASS = os.getenv("MINIO_ROOT_PASSWORD","minioadmin123")
 MINIO_BUCKET = os.getenv("MINIO_BUCKET","fx-raw")
 
-# --- dLinear (아주 단순화한 일변량 버전) ---
-class DLinear(nn.Module):
-    def __init__(self, seq_len, pred_len):
-        super().__init__()
-        self.seq_len  = seq_len
-        self.pred_len = pred_len
-        self.linear   = nn.Linear(seq_len, pred_len)
-
-    def forward(self, x):            # x: [B, seq_len]
-        return self.linear(x)        # -> [B, pred_len]
-
 def get_engine():
-    uri = f"postgresql+psycopg2://{PG_USER}:{PG_PASS}@{PG_HOST}:{PG_PORT}/{PG_DB}"
-    return create_engine(uri, pool_pre_ping=True)
+    return forecast_writer.get_engine()
 
 def load_series():
     sql = """
@@ -50,76 +37,14 @@ def load_series():
     return df
 
 def make_ds(values, ctx, horizon):
-    X, Y = [], []
-    for i in range(len(values) - ctx - horizon + 1):
-        X.append(values[i:i+ctx])
-        Y.append(values[i+ctx:i+ctx+horizon])
-    X = np.asarray(X, dtype=np.float32); Y = np.asarray(Y, dtype=np.float32)
-    return torch.from_numpy(X), torch.from_numpy(Y)
+    """[N, ctx] / [N, horizon] 윈도우 (values 를 공유하는 view -> torch 로도 복사 없이)"""
+    X, Y = sliding(values, ctx, horizon)
+    return to_torch(X, Y)
 
 def save_pg(dates, y_pred, last_true):
-    """DLinear 예측을 Postgres에 UPSERT"""
-    import os
-    from datetime import datetime
-    from math import isnan
-    from sqlalchemy import MetaData, Table, Column, Date, String, Float, DateTime, text
-    from sqlalchemy.dialects.postgresql import insert
-
-    eng = get_engine()
-
-    # horizon(H)에 따라 테이블 선택
-    horizon = int(os.getenv("H", "1"))
-    if horizon == 1:
-        table_name = "fx_forecast_daily"
-    elif horizon == 5:
-        table_name = "fx_forecast_h5"
-    elif horizon == 7:
-        table_name = "fx_forecast_h7"
-    else:
-        table_name = "fx_forecast_long"
-
-    meta = MetaData()
-    tbl = Table(
-        table_name,
-        meta,
-        Column("kst_date", Date, primary_key=True),
-        Column("pair", String, primary_key=True),
-        Column("model", String, primary_key=True),
-        Column("y_pred", Float),
-        Column("y_true", Float),
-        Column("run_ts", DateTime),
-    )
-
-    ds = list(dates)
-    preds = list(y_pred)
-
-    with eng.begin() as conn:
-        for d, y in zip(ds, preds):
-            try:
-                y_val = float(y)
-            except (TypeError, ValueError):
-                continue
-            if isnan(y_val):
-                continue
-
-            stmt = insert(tbl).values(
-                kst_date=d.date() if hasattr(d, "date") else d,
-                pair=PAIR,
-                model=MODEL,
-                y_pred=y_val,
-                y_true=float(last_true) if last_true is not None else None,
-                run_ts=datetime.utcnow(),
-            )
-
-            stmt = stmt.on_conflict_do_update(
-                index_elements=["kst_date", "pair", "model"],
-                set_={
-                    "y_pred": stmt.excluded.y_pred,
-                    "y_true": stmt.excluded.y_true,
-                    "run_ts": text("NOW()"),
-                },
-            )
-            conn.execute(stmt)
+    """DLinear 예측을 Postgres에 UPSERT (H 로 테이블 결정, 한 문장: forecast_writer.py)"""
+    forecast_writer.save([{"pair": PAIR, "model": MODEL, "horizon": HORIZ,
+                           "pred_dates": dates, "y_pred": y_pred, "last_true": last_true}])
 
 
 def save_minio_csv(pred_dates, y_pred):
@@ -155,28 +80,45 @@ def main():
     Xva, Yva = X[tr:], Y[tr:]
 
     model = DLinear(CTX, HORIZ)
-    opt = torch.optim.Adam(model.parameters(), lr=LR)
     loss_fn = nn.MSELoss()
-
-    model.train()
-    for epoch in range(EPOCHS):
-        opt.zero_grad()
-        yhat = model(Xtr).squeeze()
-        loss = loss_fn(yhat, Ytr.squeeze())
-        loss.backward()
-        opt.step()
-        if len(Xva)>0 and (epoch+1)%20==0:
-           model.eval()
-           with torch.no_grad():
-               yva = model(Xva).squeeze()
-               va_mse = loss_fn(yva, Yva.squeeze()).item()
-               # 역스케일 기준 MAE/MAPE 출력
-               yva_np  = yva.cpu().numpy() * std + mean
-               ytrue_np= Yva.squeeze().cpu().numpy() * std + mean
-               mae = float(np.mean(np.abs(yva_np - ytrue_np)))
-               mape = float(np.mean(np.abs((yva_np - ytrue_np)/(ytrue_np+1e-8)))*100)
-           model.train()
-           print(f"[val] epoch={epoch+1} MSE={va_mse:.6f}  MAE={mae:.6f}  MAPE={mape:.2f}%")
+    dhash = ckpt.data_hash(vals, df["kst_date"])
+
+    def report_val(tag):
+        model.eval()
+        with torch.no_grad():
+            yva = model(Xva).squeeze()
+            va_mse = loss_fn(yva, Yva.squeeze()).item()
+            # 역스케일 기준 MAE/MAPE 출력
+            yva_np  = yva.cpu().numpy() * std + mean
+            ytrue_np= Yva.squeeze().cpu().numpy() * std + mean
+            mae = float(np.mean(np.abs(yva_np - ytrue_np)))
+            mape = float(np.mean(np.abs((yva_np - ytrue_np)/(ytrue_np+1e-8)))*100)
+        model.train()
+        print(f"[val] {tag} MSE={va_mse:.6f}  MAE={mae:.6f}  MAPE={mape:.2f}%")
+
+    if linsolve.SOLVER != "adam":
+        # 분해 + Linear 모두 x 에 선형 -> NumPy 로 최적해를 바로 (DLINEAR_SOLVER=lstsq|ridge)
+        model.fit_closed_form(Xtr, Ytr)
+        if len(Xva)>0:
+            report_val(f"solver={linsolve.SOLVER}")
+    else:
+        # 어제 체크포인트가 있으면 거기서 FINETUNE_EPOCHS 만 (데이터가 그대로면 학습 생략)
+        mode = ckpt.warm_start(model, ckpt.load_latest(PAIR, MODEL, CTX, HORIZ), dhash)
+        epochs = {"same": 0, "warm": ckpt.FINETUNE_EPOCHS}.get(mode, EPOCHS)
+        print(f"[ckpt] {mode} start, epochs={epochs}")
+        opt = torch.optim.Adam(model.parameters(), lr=LR)
+        model.train()
+        for epoch in range(epochs):
+            opt.zero_grad()
+            yhat = model(Xtr).squeeze()
+            loss = loss_fn(yhat, Ytr.squeeze())
+            loss.backward()
+            opt.step()
+            if len(Xva)>0 and (epoch+1)%20==0:
+                report_val(f"epoch={epoch+1}")
+
+    ckpt.save(PAIR, MODEL, CTX, HORIZ, dhash,
+              {"state_dict": model.state_dict(), "mu": float(mean), "sigma": float(std), "kernel": model.kernel})
 
     # 마지막 구간으로 예측
     x_last = torch.from_numpy(z[-CTX:].copy()).unsqueeze(0)  # [1, CTX]
@@ -0,0 +1,38 @@
+"""
+학습 윈도우 공용 유틸 (train_any.py / train_dlinear.py / run_all.py)
+
+- numpy sliding_window_view 로 [N, CTX] 입력 / [N, H] 타깃을 만든다
+  -> 시리즈 버퍼를 그대로 보는 strided view 라 복사도, 파이썬 루프도 없음
+- torch.from_numpy 로 넘겨서 torch 쪽에서도 같은 메모리를 공유 (두 번째 복사 없음)
+
+주의: 반환되는 X/Y 는 서로 겹치는 view 라서 제자리 수정(x -= ..., x[...] = ...)하면 안 된다.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def as_series(values, dtype=np.float32):
+    """pd.Series/list/ndarray -> 연속된 1차원 ndarray (dtype 이 같으면 복사 없음)"""
+    if hasattr(values, "to_numpy"):
+        values = values.to_numpy()
+    return np.ascontiguousarray(values, dtype=dtype)
+
+
+def sliding(values, ctx, horizon=1, dtype=np.float32):
+    """
+    1차원 시리즈 -> (X [N, ctx], Y [N, horizon]),  N = len - ctx - horizon + 1
+    X[i] = v[i : i+ctx],  Y[i] = v[i+ctx : i+ctx+horizon]  (둘 다 v 의 view)
+    """
+    v = as_series(values, dtype)
+    if len(v) < ctx + horizon:
+        return np.empty((0, ctx), dtype), np.empty((0, horizon), dtype)
+    # writeable=True: torch.from_numpy 가 read-only 경고를 내지 않도록 (실제로 쓰지는 않음)
+    w = sliding_window_view(v, ctx + horizon, writeable=True)   # [N, ctx+horizon]
+    return w[:, :ctx], w[:, ctx:]
+
+
+def to_torch(*arrays):
+    """ndarray(view 포함) -> torch.Tensor, 메모리 공유 (복사 없음)"""
+    import torch
+    out = tuple(torch.from_numpy(a) for a in arrays)
+    return out[0] if len(out) == 1 else out
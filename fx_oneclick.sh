@@ -23,12 +23,11 @@ docker logs yf_daily --since "$SINCE" | egrep '\[ok\]|\[done\]|\[minio\]|\[yahoo
 
 echo "==[3/6] Postgres 뷰 생성: fx_daily_latest =="
 docker exec -i postgres bash -lc "psql -U \$POSTGRES_USER -d \$POSTGRES_DB" <<'SQL'
+-- fx_bars_daily: ingestor/yf_daily 가 틱을 쓸 때 증분 갱신하는 KST 일봉 (common/fx_bars.py)
+-- (fx_rates 전체를 DISTINCT ON 으로 훑던 기존 정의 대체, 최초 1회는 python -m common.fx_bars 로 백필)
 CREATE OR REPLACE VIEW fx_daily_latest AS
-SELECT DISTINCT ON (date_trunc('day', ts AT TIME ZONE 'Asia/Seoul'), pair)
-       date_trunc('day', ts AT TIME ZONE 'Asia/Seoul')::date AS kst_date,
-       pair, price, ts
-FROM fx_rates
-ORDER BY date_trunc('day', ts AT TIME ZONE 'Asia/Seoul'), pair, ts DESC;
+SELECT kst_date, pair, close AS price, last_ts AS ts
+FROM fx_bars_daily;
 SQL
 
 echo "==[4/6] MinIO 보존정책(ILM) 180일 설정 =="
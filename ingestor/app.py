@@ -1,53 +1,320 @@
-import os, sys, time
-from dateutil import parser as dtp
-from kafka import KafkaConsumer
+import os, sys, time, signal, argparse
+import multiprocessing as mp
+from kafka import KafkaConsumer, TopicPartition, ConsumerRebalanceListener
 import psycopg2
+from psycopg2.extras import execute_values
+
+# 로컬 실행 시 repo 루트의 common/ 을 찾도록 (컨테이너에서는 /app/common 으로 마운트)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import fx_schema, fx_bars
+from common.tick_parser import parse_values
 
 kafka_bootstrap = os.getenv("KAFKA_BOOTSTRAP","kafka:19092")
 topic = os.getenv("KAFKA_TOPIC","fx_rate_raw")
+group_id = os.getenv("KAFKA_GROUP_ID","fx_ingestor_g1")
 pg_dsn = f"dbname={os.getenv('POSTGRES_DB')} user={os.getenv('POSTGRES_USER')} password={os.getenv('POSTGRES_PASSWORD')} host=postgres port=5432"
 
+# 배치 크기/대기시간: 둘 중 먼저 도달하는 쪽에서 한 번에 INSERT + COMMIT
+BATCH_MAX     = int(os.getenv("INGEST_BATCH_MAX","500"))
+BATCH_WAIT_MS = int(os.getenv("INGEST_BATCH_WAIT_MS","200"))
+IDLE_POLL_MS  = 1000
+RETRY_SLEEP_S = 1.0
+
+# sync: poll -> parse -> write 순차 루프 / async: async_engine 의 파이프라인
+ENGINE = os.getenv("INGEST_ENGINE","sync")
+
+# 슈퍼바이저 모드: 같은 consumer group 으로 워커 프로세스 N개 (파티션 수 이하 권장)
+WORKERS            = int(os.getenv("INGEST_WORKERS","1"))
+SUPERVISE_EVERY_S  = 2.0
+SHUTDOWN_TIMEOUT_S = 30.0
+
+_stopping = False
+log_tag = "[ingestor]"
+
+# 파티션별 "다음에 읽을 오프셋"을 fx_rates 와 같은 트랜잭션에서 저장.
+# 리밸런스 직후 같은 레코드를 두 컨슈머가 쓰더라도 오프셋이 뒤로 가지 않게 GREATEST 사용.
+OFFSETS_UPSERT_SQL = """
+  INSERT INTO fx_ingest_offsets(consumer_group, topic, partition, next_offset)
+  VALUES %s
+  ON CONFLICT (consumer_group, topic, partition) DO UPDATE
+    SET next_offset = GREATEST(fx_ingest_offsets.next_offset, EXCLUDED.next_offset),
+        updated_at  = now()
+"""
+
+OFFSETS_DDL = """
+CREATE TABLE IF NOT EXISTS fx_ingest_offsets (
+  consumer_group text NOT NULL,
+  topic text NOT NULL,
+  partition int NOT NULL,
+  next_offset bigint NOT NULL,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (consumer_group, topic, partition)
+);"""
+
 def ensure_table(conn):
+    with conn.cursor() as cur:
+        fx_schema.ensure_schema(cur)
+        fx_bars.ensure_schema(cur)
+        cur.execute(OFFSETS_DDL)
+    conn.commit()
+
+def load_offsets(conn, partitions):
+    """fx_ingest_offsets 에 저장된 {partition: next_offset}"""
     with conn.cursor() as cur:
         cur.execute("""
-        CREATE TABLE IF NOT EXISTS fx_rates (
-          ts timestamptz PRIMARY KEY,
-          pair text NOT NULL,
-          price numeric(12,6) NOT NULL
-        );""")
+          SELECT partition, next_offset FROM fx_ingest_offsets
+          WHERE consumer_group=%s AND topic=%s AND partition = ANY(%s)
+        """, (group_id, topic, list(partitions)))
+        offsets = dict(cur.fetchall())
     conn.commit()
+    return offsets
+
+class SeekToStoredOffsets(ConsumerRebalanceListener):
+    """
+    파티션을 할당받을 때마다 Postgres 에 저장된 오프셋으로 seek.
+    저장된 값이 없는 파티션(최초 배포)만 Kafka 커밋 오프셋 / auto_offset_reset 을 따른다.
+    """
+    def __init__(self, consumer, conn):
+        self.consumer = consumer
+        self.conn = conn
+        self.revoked = set()   # 배치를 모으는 도중 회수된 파티션 (collect_batch 가 비움)
+
+    def on_partitions_revoked(self, revoked):
+        # collect_batch 는 배치 하나에 poll 을 여러 번 부르므로 모으는 도중에 리밸런스될 수 있다
+        # -> 회수된 파티션을 기록해 두고 collect_batch 가 그 레코드를 버린다
+        self.revoked.update(revoked)
+
+    def on_partitions_assigned(self, assigned):
+        offsets = load_offsets(self.conn, [tp.partition for tp in assigned])
+        for tp in assigned:
+            if tp.partition in offsets:
+                self.consumer.seek(tp, offsets[tp.partition])
+        print(f"{log_tag} assigned {sorted(tp.partition for tp in assigned)} "
+              f"stored_offsets={offsets}", flush=True)
+
+def collect_batch(consumer, listener):
+    """
+    첫 레코드가 올 때까지는 IDLE_POLL_MS 로 대기하고,
+    이후 BATCH_MAX 건 또는 BATCH_WAIT_MS 경과 중 먼저 도달할 때까지 poll 결과를 모은다.
+    중간 poll 에서 파티션이 회수되면 그 파티션에서 이미 모은 레코드는 버린다
+    (새 주인이 fx_ingest_offsets 에 저장된 오프셋부터 다시 읽음)
+    """
+    records = []
+    listener.revoked.clear()
+    deadline = None
+    while len(records) < BATCH_MAX:
+        if deadline is None:
+            timeout_ms = IDLE_POLL_MS
+        else:
+            timeout_ms = int((deadline - time.monotonic()) * 1000)
+            if timeout_ms <= 0:
+                break
+        polled = consumer.poll(timeout_ms=timeout_ms, max_records=BATCH_MAX - len(records))
+        if listener.revoked:
+            records = [r for r in records
+                       if TopicPartition(r.topic, r.partition) not in listener.revoked]
+            listener.revoked.clear()
+        for recs in polled.values():
+            records.extend(recs)
+        if deadline is None:
+            if not records:
+                break
+            deadline = time.monotonic() + BATCH_WAIT_MS / 1000
+    return records
+
+def parse_batch(records):
+    """레코드 -> 컬럼형 TickBatch. 형식이 틀린 메시지는 로그만 남기고 건너뛴다."""
+    batch, errors = parse_values([record.value for record in records])
+    for value, e in errors:
+        print(f"{log_tag} [ERR] {value} -> {e}", file=sys.stderr, flush=True)
+    return batch
+
+def next_offsets(records):
+    """배치에서 파티션별 다음 오프셋(마지막 offset + 1)"""
+    nxt = {}
+    for record in records:
+        nxt[record.partition] = max(nxt.get(record.partition, 0), record.offset + 1)
+    return nxt
+
+def upsert_isolating(cur, batch):
+    """
+    데이터 오류(DataError/IntegrityError, 예: numeric(12,6) 범위 초과)가 난 배치용.
+    SAVEPOINT 안에서 UPSERT 하고, 실패하면 반씩 나눠 다시 -> 끝까지 거부된 [(ts, pair, price, error)]
+    """
+    bad = []
+    def go(lo, hi):
+        cur.execute("SAVEPOINT fx_rows")
+        try:
+            cur.execute(fx_schema.UPSERT_SQL, (batch.ts[lo:hi], batch.pair[lo:hi], batch.price[lo:hi]))
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            cur.execute("ROLLBACK TO SAVEPOINT fx_rows")
+            cur.execute("RELEASE SAVEPOINT fx_rows")
+            if hi - lo == 1:
+                bad.append((batch.ts[lo], batch.pair[lo], batch.price[lo], e))
+                return
+            mid = (lo + hi) // 2
+            go(lo, mid)
+            go(mid, hi)
+            return
+        cur.execute("RELEASE SAVEPOINT fx_rows")
+    go(0, len(batch))
+    return bad
+
+def write_batch(conn, batch, offsets, isolate=False):
+    """
+    배치 전체를 unnest UPSERT 한 번으로 쓰고,
+    같은 트랜잭션에서 1분봉/일봉 갱신과 파티션 오프셋까지 기록한 뒤 한 번만 COMMIT.
+    isolate=True 면 upsert_isolating 으로 나쁜 행만 빼고 쓴다 -> 버린 행 리스트
+    """
+    bad = []
+    with conn.cursor() as cur:
+        months = fx_schema.ensure_partitions(cur, batch.ts)
+        if batch:
+            if isolate:
+                bad = upsert_isolating(cur, batch)
+            else:
+                cur.execute(fx_schema.UPSERT_SQL, (batch.ts, batch.pair, batch.price))
+            fx_bars.refresh(cur, batch.ts, batch.pair)   # 걸친 1분봉/일봉만 재계산
+        execute_values(cur, OFFSETS_UPSERT_SQL,
+                       [(group_id, topic, p, o) for p, o in offsets.items()])
+    conn.commit()
+    fx_schema.remember_months(months)
+    return bad
+
+def write_or_skip(conn, batch, offsets):
+    """
+    write_batch. 데이터 오류는 같은 배치를 다시 보내도 또 실패하므로
+    나쁜 행만 골라 로그를 남기고 버린 뒤 나머지와 오프셋을 COMMIT (baseline 처럼 레코드 단위 skip).
+    연결 오류 등 그 밖의 예외는 그대로 올린다 (호출 쪽에서 되감고 재시도).
+    """
+    try:
+        return write_batch(conn, batch, offsets)
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        conn.rollback()
+        print(f"{log_tag} [ERR] batch of {len(batch)} rows, isolating bad rows -> {e}", file=sys.stderr, flush=True)
+    bad = write_batch(conn, batch, offsets, isolate=True)
+    for ts, pair, price, e in bad:
+        print(f"{log_tag} [ERR] skip {pair},{price},{ts} -> {e}", file=sys.stderr, flush=True)
+    return bad
+
+def rewind(consumer, records):
+    """
+    DB 쓰기 실패 시 배치 시작 오프셋으로 되감아 다음 poll 에서 다시 읽게 한다.
+    지금 할당된 파티션만 (회수된 파티션 seek 는 예외 -> 그 파티션은 새 주인이 저장된 오프셋부터 읽음)
+    """
+    assigned = consumer.assignment()
+    first = {}
+    for record in records:
+        tp = TopicPartition(record.topic, record.partition)
+        first[tp] = min(first.get(tp, record.offset), record.offset)
+    for tp, offset in first.items():
+        if tp in assigned:
+            consumer.seek(tp, offset)
+
+def _request_stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+def run_worker(worker_id=0, engine="sync"):
+    """
+    컨슈머 1개 + Postgres 커넥션 1개로 배치 적재.
+    SIGTERM/SIGINT 를 받으면 진행 중인 배치까지 COMMIT 한 뒤 그룹에서 빠지고 종료한다.
+    """
+    global log_tag
+    log_tag = f"[ingestor-{worker_id}]"
+    if engine == "async":
+        import asyncio, async_engine
+        asyncio.run(async_engine.run(log_tag))
+        return
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
 
-def main():
     consumer = KafkaConsumer(
-        topic,
         bootstrap_servers=[kafka_bootstrap],
-        auto_offset_reset="earliest",
-        enable_auto_commit=True,
-        group_id="fx_ingestor_g1",
+        auto_offset_reset="earliest",   # Postgres 에 오프셋이 없는 파티션에만 적용
+        enable_auto_commit=False,       # 오프셋의 기준은 fx_ingest_offsets
+        group_id=group_id,
         value_deserializer=lambda v: v.decode("utf-8")
     )
     conn = psycopg2.connect(pg_dsn)
     ensure_table(conn)
-    print(f"[ingestor] consuming from {topic} on {kafka_bootstrap}", flush=True)
-
-    while True:
-        for msg in consumer.poll(timeout_ms=1000).values():
-            for record in msg:
-                try:
-                    pair, price, ts = [x.strip() for x in record.value.split(",")]
-                    ts_parsed = dtp.parse(ts)
-                    with conn.cursor() as cur:
-                        cur.execute("""
-                          INSERT INTO fx_rates(ts, pair, price)
-                          VALUES (%s, %s, %s)
-                          ON CONFLICT (ts) DO UPDATE SET pair=EXCLUDED.pair, price=EXCLUDED.price
-                        """, (ts_parsed, pair, price))
-                    conn.commit()
-                    print(f"[OK] {record.value}", flush=True)
-                except Exception as e:
-                    conn.rollback()
-                    print(f"[ERR] {record.value} -> {e}", file=sys.stderr, flush=True)
-        time.sleep(0.2)
+    listener = SeekToStoredOffsets(consumer, conn)
+    consumer.subscribe([topic], listener=listener)
+    print(f"{log_tag} consuming from {topic} on {kafka_bootstrap} "
+          f"(batch_max={BATCH_MAX}, batch_wait_ms={BATCH_WAIT_MS})", flush=True)
+
+    while not _stopping:
+        records = collect_batch(consumer, listener)
+        if not records:
+            continue
+        batch = parse_batch(records)
+        try:
+            bad = write_or_skip(conn, batch, next_offsets(records))
+        except Exception as e:
+            # 연결 오류 등 일시적인 실패만 여기로 온다: 되감고 같은 배치를 재시도
+            conn.rollback()
+            print(f"{log_tag} [ERR] batch of {len(batch)} rows -> {e}", file=sys.stderr, flush=True)
+            rewind(consumer, records)
+            time.sleep(RETRY_SLEEP_S)
+            continue
+        # Kafka 쪽 커밋은 lag 모니터링용 (best-effort)
+        consumer.commit_async()
+        print(f"{log_tag} [OK] {len(batch) - len(bad)} rows ({len(records)} records)", flush=True)
+
+    # 그룹에서 바로 빠져서 남은 워커로 즉시 리밸런스되게 한다
+    consumer.close(autocommit=False)
+    conn.close()
+    print(f"{log_tag} drained, bye", flush=True)
+
+def supervise(n, engine="sync"):
+    """
+    워커 프로세스 n개를 띄우고, 죽은 워커는 다시 띄운다.
+    종료 신호를 받으면 워커에 SIGTERM 을 보내 배치를 마무리할 시간을 준다.
+    """
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    ctx = mp.get_context("spawn")
+    procs = {}
+
+    def start(i):
+        p = ctx.Process(target=run_worker, args=(i, engine), name=f"ingestor-{i}")
+        p.start()
+        procs[i] = p
+        print(f"[supervisor] started worker {i} pid={p.pid}", flush=True)
+
+    for i in range(n):
+        start(i)
+    while not _stopping:
+        time.sleep(SUPERVISE_EVERY_S)
+        for i, p in list(procs.items()):
+            if not p.is_alive() and not _stopping:
+                print(f"[supervisor] worker {i} exited (code={p.exitcode}), restarting",
+                      file=sys.stderr, flush=True)
+                start(i)
+
+    print(f"[supervisor] stopping {len(procs)} workers", flush=True)
+    for p in procs.values():
+        if p.is_alive():
+            p.terminate()   # SIGTERM -> run_worker 가 배치를 마무리하고 종료
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT_S
+    for p in procs.values():
+        p.join(max(0.0, deadline - time.monotonic()))
+        if p.is_alive():
+            print(f"[supervisor] {p.name} did not stop in time, killing", file=sys.stderr, flush=True)
+            p.kill()
+            p.join()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=WORKERS,
+                    help="worker processes in the consumer group (1 = no supervisor)")
+    ap.add_argument("--engine", choices=["sync","async"], default=ENGINE,
+                    help="sync: sequential poll/parse/write loop, async: pipelined asyncio engine")
+    args = ap.parse_args()
+    if args.workers <= 1:
+        run_worker(engine=args.engine)
+    else:
+        supervise(args.workers, args.engine)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,224 @@
+"""
+asyncio 기반 ingestor 엔진 (INGEST_ENGINE=async / app.py --engine async)
+
+  consume --(raw_q)--> parse --(write_q)--> write
+
+- 단계 사이 큐는 크기가 정해져 있어서(INGEST_QUEUE_MAX) Postgres 가 밀리면
+  write_q -> raw_q 순으로 차고 consume 단계가 자연스럽게 멈춘다 (고정 sleep 없음)
+- consume 은 getmany() 로 도착한 만큼 바로 넘기고,
+  write 는 큐에 쌓여 있는 배치를 INGEST_BATCH_MAX 행까지 합쳐 한 트랜잭션으로 쓴다
+  -> 한가할 때는 틱 단위로 바로, 부하가 있을 때는 큰 배치로 COMMIT
+- 1분봉/일봉 갱신, 오프셋(fx_ingest_offsets)은 동기 엔진과 같이 같은 트랜잭션에서 처리
+"""
+import os, sys, asyncio, signal
+import asyncpg
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener
+from app import (kafka_bootstrap, topic, group_id, BATCH_MAX, IDLE_POLL_MS,
+                 RETRY_SLEEP_S, OFFSETS_DDL, fx_schema, fx_bars)
+from common.tick_parser import TickBatch, parse_values
+
+QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX","8"))
+
+# 같은 배치를 다시 보내도 또 실패하는 값 오류 (예: numeric(12,6) 범위 초과) -> 재시도하지 않고 그 행만 버림
+DATA_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError)
+
+PG_KW = dict(
+    database=os.getenv("POSTGRES_DB"),
+    user=os.getenv("POSTGRES_USER"),
+    password=os.getenv("POSTGRES_PASSWORD"),
+    host=os.getenv("POSTGRES_HOST","postgres"),
+    port=int(os.getenv("POSTGRES_PORT","5432")),
+)
+
+# app.OFFSETS_UPSERT_SQL 의 asyncpg($n) 버전
+OFFSETS_UPSERT_SQL = """
+  INSERT INTO fx_ingest_offsets(consumer_group, topic, partition, next_offset)
+  SELECT $1, $2, p, o FROM unnest($3::int[], $4::bigint[]) AS t(p, o)
+  ON CONFLICT (consumer_group, topic, partition) DO UPDATE
+    SET next_offset = GREATEST(fx_ingest_offsets.next_offset, EXCLUDED.next_offset),
+        updated_at  = now()
+"""
+
+def log(*a, **k): print(*a, **k, flush=True)
+
+
+class SeekToStoredOffsets(ConsumerRebalanceListener):
+    """app.SeekToStoredOffsets 와 동일. 회수 전에는 파이프라인을 비워 COMMIT 까지 끝낸다."""
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def on_partitions_revoked(self, revoked):
+        await self.engine.drain()
+
+    async def on_partitions_assigned(self, assigned):
+        parts = [tp.partition for tp in assigned]
+        rows = await self.engine.pool.fetch("""
+          SELECT partition, next_offset FROM fx_ingest_offsets
+          WHERE consumer_group=$1 AND topic=$2 AND partition = ANY($3::int[])
+        """, group_id, topic, parts)
+        offsets = {r["partition"]: r["next_offset"] for r in rows}
+        for tp in assigned:
+            if tp.partition in offsets:
+                self.engine.consumer.seek(tp, offsets[tp.partition])
+        log(f"{self.engine.tag} assigned {sorted(parts)} stored_offsets={offsets}")
+
+
+class AsyncIngestor:
+    def __init__(self, tag="[ingestor]"):
+        self.tag = tag
+        self.stop = asyncio.Event()
+        self.raw_q = asyncio.Queue(QUEUE_MAX)
+        self.write_q = asyncio.Queue(QUEUE_MAX)
+        self.pool = None
+        self.consumer = None
+
+    async def drain(self):
+        """지금까지 넘긴 배치가 모두 COMMIT 될 때까지 대기"""
+        await self.raw_q.join()
+        await self.write_q.join()
+
+    # ---------- stages ----------
+    async def consume(self):
+        while not self.stop.is_set():
+            polled = await self.consumer.getmany(timeout_ms=IDLE_POLL_MS, max_records=BATCH_MAX)
+            if not polled:
+                continue
+            offsets = {tp.partition: recs[-1].offset + 1 for tp, recs in polled.items()}
+            values = [r.value for recs in polled.values() for r in recs]
+            await self.raw_q.put((values, offsets))   # 큐가 차면 여기서 대기 (backpressure)
+
+    async def parse(self):
+        while True:
+            values, offsets = await self.raw_q.get()
+            batch, errors = parse_values(values)
+            for value, e in errors:
+                print(f"{self.tag} [ERR] {value} -> {e}", file=sys.stderr, flush=True)
+            await self.write_q.put((batch, offsets, len(values)))
+            self.raw_q.task_done()
+
+    async def write(self):
+        while True:
+            items = [await self.write_q.get()]
+            rows = len(items[0][0])
+            # 쌓여 있는 배치를 BATCH_MAX 행까지 합쳐 한 번에 COMMIT
+            while rows < BATCH_MAX and not self.write_q.empty():
+                items.append(self.write_q.get_nowait())
+                rows += len(items[-1][0])
+            batch, offsets, n_records = self._merge(items)
+            while True:
+                try:
+                    bad = await self._write_or_skip(batch, offsets)
+                    break
+                except Exception as e:
+                    # 연결 오류 등 일시적인 실패: 순서를 지키기 위해 같은 배치를 재시도 (그동안 앞 단계는 큐에서 멈춤)
+                    print(f"{self.tag} [ERR] batch of {len(batch)} rows -> {e}", file=sys.stderr, flush=True)
+                    await asyncio.sleep(RETRY_SLEEP_S)
+            log(f"{self.tag} [OK] {len(batch) - len(bad)} rows ({n_records} records)")
+            for _ in items:
+                self.write_q.task_done()
+
+    @staticmethod
+    def _merge(items):
+        merged, offsets, n_records = TickBatch(), {}, 0
+        for batch, offs, n in items:
+            merged.ts.extend(batch.ts)
+            merged.pair.extend(batch.pair)
+            merged.price.extend(batch.price)
+            for p, o in offs.items():
+                offsets[p] = max(offsets.get(p, 0), o)
+            n_records += n
+        return merged, offsets, n_records
+
+    async def _write_or_skip(self, batch, offsets):
+        """_write. 데이터 오류면 나쁜 행만 골라 버리고 나머지+오프셋을 COMMIT -> 버린 행 (그 밖의 예외는 그대로 올림)"""
+        try:
+            return await self._write(batch, offsets)
+        except DATA_ERRORS as e:
+            print(f"{self.tag} [ERR] batch of {len(batch)} rows, isolating bad rows -> {e}",
+                  file=sys.stderr, flush=True)
+        bad = await self._write(batch, offsets, isolate=True)
+        for ts, pair, price, e in bad:
+            print(f"{self.tag} [ERR] skip {pair},{price},{ts} -> {e}", file=sys.stderr, flush=True)
+        return bad
+
+    @staticmethod
+    async def _upsert_isolating(conn, batch):
+        """app.upsert_isolating 과 동일: 중첩 transaction(SAVEPOINT) 안에서 쓰고, 실패하면 반씩 나눠 다시"""
+        bad = []
+        async def go(lo, hi):
+            try:
+                async with conn.transaction():
+                    await conn.execute(fx_schema.UPSERT_SQL_ASYNCPG,
+                                       batch.ts[lo:hi], batch.pair[lo:hi], batch.price[lo:hi])
+            except DATA_ERRORS as e:
+                if hi - lo == 1:
+                    bad.append((batch.ts[lo], batch.pair[lo], batch.price[lo], e))
+                    return
+                mid = (lo + hi) // 2
+                await go(lo, mid)
+                await go(mid, hi)
+        await go(0, len(batch))
+        return bad
+
+    async def _write(self, batch, offsets, isolate=False):
+        months = fx_schema.missing_months(batch.ts)
+        bad = []
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                if months:
+                    await conn.execute(fx_schema.ENSURE_PARTITIONS_SQL_ASYNCPG, months)
+                if batch:
+                    if isolate:
+                        bad = await self._upsert_isolating(conn, batch)
+                    else:
+                        await conn.execute(fx_schema.UPSERT_SQL_ASYNCPG, batch.ts, batch.pair, batch.price)
+                    await conn.execute(fx_bars.LOCK_SQL_ASYNCPG, batch.ts, batch.pair)
+                    await conn.execute(fx_bars.REFRESH_1M_SQL_ASYNCPG, batch.ts, batch.pair)
+                    await conn.execute(fx_bars.REFRESH_DAILY_SQL_ASYNCPG, batch.ts, batch.pair)
+                await conn.execute(OFFSETS_UPSERT_SQL, group_id, topic,
+                                   list(offsets.keys()), list(offsets.values()))
+        fx_schema.remember_months(months)
+        return bad
+
+    # ---------- lifecycle ----------
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop.set)
+
+        self.pool = await asyncpg.create_pool(min_size=1, max_size=2, **PG_KW)
+        async with self.pool.acquire() as conn, conn.transaction():   # FX_RATES_DDL 의 advisory lock 을 끝까지 유지
+            await conn.execute(fx_schema.FX_RATES_DDL)
+            await conn.execute(fx_bars.BARS_DDL)
+            await conn.execute(OFFSETS_DDL)
+
+        self.consumer = AIOKafkaConsumer(
+            bootstrap_servers=kafka_bootstrap,
+            group_id=group_id,
+            auto_offset_reset="earliest",
+            enable_auto_commit=False,
+            value_deserializer=lambda v: v.decode("utf-8"),
+        )
+        self.consumer.subscribe([topic], listener=SeekToStoredOffsets(self))
+        await self.consumer.start()
+        log(f"{self.tag} async engine consuming from {topic} on {kafka_bootstrap} "
+            f"(batch_max={BATCH_MAX}, queue_max={QUEUE_MAX})")
+
+        tasks = [asyncio.create_task(self.consume()),
+                 asyncio.create_task(self.parse()),
+                 asyncio.create_task(self.write())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                t.result()   # parse/write 가 예외로 죽었으면 올려서 프로세스를 끝낸다 (슈퍼바이저가 재시작)
+            await self.drain()
+        finally:
+            for t in tasks:
+                t.cancel()
+            await self.consumer.stop()
+            await self.pool.close()
+        log(f"{self.tag} drained, bye")
+
+
+async def run(tag="[ingestor]"):
+    await AsyncIngestor(tag).run()
@@ -0,0 +1,47 @@
+"""
+틱 파서 마이크로 벤치마크: 기존(split+strip+dateutil) vs tick_parser
+
+  python bench_parser.py [N]
+"""
+import os, sys, time
+from dateutil import parser as dtp
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.tick_parser import parse_values
+
+def make_values(n, epoch_ms=False):
+    base = 1_735_689_600_000  # 2025-01-01T00:00:00Z (epoch ms)
+    out = []
+    for i in range(n):
+        if epoch_ms:
+            ts = str(base + i)
+        else:
+            ts = f"2025-01-01T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}.{i % 1000:03d}+00:00"
+        out.append(f"USDKRW, {1300 + (i % 1000) / 100:.2f}, {ts}")
+    return out
+
+def legacy(values):
+    """기존 ingestor/app.py 의 레코드당 파싱"""
+    rows = []
+    for v in values:
+        pair, price, ts = [x.strip() for x in v.split(",")]
+        rows.append((dtp.parse(ts), pair, price))
+    return rows
+
+def bench(fn, values, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(values)
+        best = min(best, time.perf_counter() - t0)
+    return len(values) / best
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    iso = make_values(n)
+    before = bench(legacy, iso)
+    after = bench(parse_values, iso)
+    after_ms = bench(parse_values, make_values(n, epoch_ms=True))
+    print(f"[bench] n={n}")
+    print(f"[bench] legacy (dateutil, ISO) : {before:12,.0f} msg/s")
+    print(f"[bench] tick_parser (ISO)      : {after:12,.0f} msg/s  (x{after / before:.1f})")
+    print(f"[bench] tick_parser (epoch ms) : {after_ms:12,.0f} msg/s  (x{after_ms / before:.1f})")
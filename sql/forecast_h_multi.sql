@@ -1,81 +1,59 @@
--- 1) 테이블: 하루치(기존), 5일치, 7일치 (스키마 동일)
-CREATE TABLE IF NOT EXISTS fx_forecast_h5 (
-  kst_date date NOT NULL,
-  pair     text NOT NULL,
-  model    text NOT NULL,
-  y_true   double precision,
-  y_pred   double precision,
-  yhat_lo  double precision,
-  yhat_hi  double precision,
-  run_ts   timestamptz DEFAULT now(),
-  PRIMARY KEY (kst_date, pair, model)
-);
-
-CREATE TABLE IF NOT EXISTS fx_forecast_h7 (
-  kst_date date NOT NULL,
-  pair     text NOT NULL,
-  model    text NOT NULL,
-  y_true   double precision,
-  y_pred   double precision,
-  yhat_lo  double precision,
-  yhat_hi  double precision,
-  run_ts   timestamptz DEFAULT now(),
-  PRIMARY KEY (kst_date, pair, model)
-);
+-- 1) 테이블: 예측은 통합 테이블 fx_forecast (pair, model, horizon, origin_date, target_date) 하나에 저장,
+--    fx_forecast_daily / fx_forecast_h5 / fx_forecast_h7 / fx_forecast_long 은 같은 이름의 호환 뷰
+--    (DDL/파티션/호환 뷰/기존 테이블 이관: forecast_image_src/app/forecast_schema.py,
+--     `docker run ... fxstack/forecast:any forecast_schema.py` 를 이 파일보다 먼저 실행)
 
--- 2) “오늘 최신 실행분만” 보이게 하는 뷰 (모델별·쌍별로 최신 run_ts만 노출)
---   * 필요 시 CURRENT_DATE 대신 원하는 기준일로 바꿔도 됨
-CREATE OR REPLACE VIEW fx_forecast_h5_latest AS
+-- 2) “최신 실행분만” 보이게 하는 materialized view (모델별·쌍별로 최신 run_ts만)
+--    forecast_image_src/app/forecast_schema.py 의 LATEST_MV 와 동일하게 유지
+--    예측 저장 직후 forecast_writer 가 REFRESH MATERIALIZED VIEW CONCURRENTLY 로 갱신 -> 패널은 인덱스 조회만
+--    (CURRENT_DATE 는 refresh 시점 기준)
+CREATE MATERIALIZED VIEW IF NOT EXISTS fx_forecast_h5_latest AS
 WITH last_run AS (
   SELECT pair, MAX(run_ts) AS max_run_ts
-  FROM fx_forecast_h5
-  WHERE kst_date >= CURRENT_DATE       -- 오늘/미래 예측만
+  FROM fx_forecast
+  WHERE horizon = 5 AND target_date >= CURRENT_DATE
   GROUP BY pair
 )
-SELECT f.*
-FROM fx_forecast_h5 f
-JOIN last_run r
-  ON f.pair=r.pair AND f.run_ts=r.max_run_ts
-WHERE f.kst_date >= CURRENT_DATE;
+SELECT DISTINCT ON (f.pair, f.model, f.target_date)
+       f.target_date AS kst_date, f.pair, f.model || 'h5' AS model,
+       f.y_true, f.y_pred, f.yhat_lo, f.yhat_hi, f.run_ts
+FROM fx_forecast f
+JOIN last_run r ON f.pair = r.pair AND f.run_ts = r.max_run_ts
+WHERE f.horizon = 5 AND f.target_date >= CURRENT_DATE
+ORDER BY f.pair, f.model, f.target_date, f.origin_date DESC;
+CREATE UNIQUE INDEX IF NOT EXISTS fx_forecast_h5_latest_key ON fx_forecast_h5_latest (pair, model, kst_date);
+CREATE INDEX IF NOT EXISTS fx_forecast_h5_latest_run ON fx_forecast_h5_latest (pair, run_ts);
 
-CREATE OR REPLACE VIEW fx_forecast_h7_latest AS
+CREATE MATERIALIZED VIEW IF NOT EXISTS fx_forecast_h7_latest AS
 WITH last_run AS (
   SELECT pair, MAX(run_ts) AS max_run_ts
-  FROM fx_forecast_h7
-  WHERE kst_date >= CURRENT_DATE
+  FROM fx_forecast
+  WHERE horizon = 7 AND target_date >= CURRENT_DATE
   GROUP BY pair
 )
-SELECT f.*
-FROM fx_forecast_h7 f
-JOIN last_run r
-  ON f.pair=r.pair AND f.run_ts=r.max_run_ts
-WHERE f.kst_date >= CURRENT_DATE;
+SELECT DISTINCT ON (f.pair, f.model, f.target_date)
+       f.target_date AS kst_date, f.pair, f.model || 'h7' AS model,
+       f.y_true, f.y_pred, f.yhat_lo, f.yhat_hi, f.run_ts
+FROM fx_forecast f
+JOIN last_run r ON f.pair = r.pair AND f.run_ts = r.max_run_ts
+WHERE f.horizon = 7 AND f.target_date >= CURRENT_DATE
+ORDER BY f.pair, f.model, f.target_date, f.origin_date DESC;
+CREATE UNIQUE INDEX IF NOT EXISTS fx_forecast_h7_latest_key ON fx_forecast_h7_latest (pair, model, kst_date);
+CREATE INDEX IF NOT EXISTS fx_forecast_h7_latest_run ON fx_forecast_h7_latest (pair, run_ts);
 
--- 3) 피벗 뷰 (Superset에서 라인 여러 개로 보기 좋게)
---    필요 모델명만 추가/제거 가능
-CREATE OR REPLACE VIEW fx_forecast_h5_latest_pivot AS
-SELECT
-  pair,
-  MAX(CASE WHEN model='dlinearh5' THEN y_pred END) AS yhat_dlinearh5,
-  MAX(CASE WHEN model='gruh5'     THEN y_pred END) AS yhat_gruh5,
-  MAX(CASE WHEN model='lstmh5'    THEN y_pred END) AS yhat_lstmh5,
-  MAX(CASE WHEN model='arimah5'   THEN y_pred END) AS yhat_arimah5,
-  kst_date
-FROM fx_forecast_h5_latest
-GROUP BY pair, kst_date
-ORDER BY kst_date;
-
-CREATE OR REPLACE VIEW fx_forecast_h7_latest_pivot AS
-SELECT
-  pair,
-  MAX(CASE WHEN model='dlinearh7' THEN y_pred END) AS yhat_dlinearh7,
-  MAX(CASE WHEN model='gruh7'     THEN y_pred END) AS yhat_gruh7,
-  MAX(CASE WHEN model='lstmh7'    THEN y_pred END) AS yhat_lstmh7,
-  MAX(CASE WHEN model='arimah7'   THEN y_pred END) AS yhat_arimah7,
-  kst_date
-FROM fx_forecast_h7_latest
-GROUP BY pair, kst_date
-ORDER BY kst_date;
+-- 3) 피벗 (fx_forecast_h5_latest_pivot / fx_forecast_h7_latest_pivot, pair·kst_date 당 1행, yhat_<model>h<H> 컬럼)
+--    모델 레지스트리 fx_model_registry 의 enabled 모델로 forecast_schema.sync_pivots 가 생성/갱신
+--    (MAX(y_pred) FILTER (WHERE model=...) 1패스 집계, UNIQUE (pair, kst_date)).
+--    모델 추가: 예측을 저장하면 자동 등록 / 빼기: UPDATE fx_model_registry SET enabled=false WHERE model='gru';
+CREATE TABLE IF NOT EXISTS fx_model_registry (
+  model      text PRIMARY KEY,          -- 베이스 모델 이름 (fx_forecast.model)
+  enabled    boolean NOT NULL DEFAULT true,
+  sort_order int NOT NULL DEFAULT 100,
+  created_at timestamptz DEFAULT now()
+);
+INSERT INTO fx_model_registry (model, sort_order)
+VALUES ('dlinear', 1), ('gru', 2), ('lstm', 3), ('arima', 4)
+ON CONFLICT (model) DO NOTHING;
 
 -- 4) 검증용 집계 뷰
 CREATE OR REPLACE VIEW fx_forecast_h_counts AS
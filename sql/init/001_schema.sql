@@ -1,8 +1,27 @@
+-- fx_rates: common/fx_schema.py 의 FX_RATES_DDL 과 동일하게 유지
 CREATE TABLE IF NOT EXISTS fx_rates (
-  ts timestamptz PRIMARY KEY,
-  pair text NOT NULL,
-  price numeric(12,6) NOT NULL
-);
+  ts    timestamptz NOT NULL,
+  pair  text NOT NULL,
+  price numeric(12,6) NOT NULL,
+  PRIMARY KEY (pair, ts)
+) PARTITION BY RANGE (ts);
+
+CREATE INDEX IF NOT EXISTS fx_rates_ts_brin ON fx_rates USING brin (ts);
+
+CREATE OR REPLACE FUNCTION fx_rates_ensure_partition(month_start date) RETURNS void AS $$
+DECLARE
+  part text := format('fx_rates_%s', to_char(month_start, 'YYYYMM'));
+BEGIN
+  IF to_regclass(part) IS NULL THEN
+    EXECUTE format('CREATE TABLE %I PARTITION OF fx_rates FOR VALUES FROM (%L) TO (%L)',
+                   part,
+                   month_start::timestamp AT TIME ZONE 'UTC',
+                   (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC');
+  END IF;
+EXCEPTION WHEN duplicate_table THEN
+  NULL;  -- 다른 워커가 먼저 만든 경우
+END $$ LANGUAGE plpgsql;
+
 CREATE TABLE IF NOT EXISTS fx_features (
   ts timestamptz PRIMARY KEY,
   dollar_index numeric(10,4),
@@ -20,3 +39,11 @@ SELECT r.ts, r.price, f.dollar_index, f.nasdaq, f.us10y, f.gold, p.pred_price
 FROM fx_rates r
 LEFT JOIN fx_features f ON f.ts = r.ts
 LEFT JOIN fx_predict  p ON p.ts = r.ts;
+CREATE TABLE IF NOT EXISTS fx_ingest_offsets (
+  consumer_group text NOT NULL,
+  topic text NOT NULL,
+  partition int NOT NULL,
+  next_offset bigint NOT NULL,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (consumer_group, topic, partition)
+);
@@ -1,10 +1,16 @@
-import os, time, io, datetime as dt
+import os, sys, time, io, random, datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import yfinance as yf
 import psycopg2
 from dateutil import tz
 import argparse
 import boto3, requests
+from requests.adapters import HTTPAdapter
+
+# 로컬 실행 시 repo 루트의 common/ 을 찾도록 (이미지에서는 /app/common 으로 복사)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import fx_schema, fx_bars
 
 # Yahoo 심볼 매핑: USDKRW는 KRW=X
 YF_TICKER_MAP = {
@@ -16,6 +22,12 @@ TZ = tz.gettz(os.getenv("LOCAL_TZ","Asia/Seoul"))
 RUN_AT = os.getenv("RUN_AT","09:05")
 SAVE_TO_MINIO = os.getenv("SAVE_TO_MINIO","true").lower() == "true"
 
+# 수집: Yahoo 는 전체 티커 1번에, stooq fallback 은 동시에. 실패는 지수 백오프 + jitter 후 재시도
+FETCH_WORKERS     = int(os.getenv("FETCH_WORKERS","16"))
+FETCH_RETRIES     = int(os.getenv("FETCH_RETRIES","3"))
+FETCH_BACKOFF     = float(os.getenv("FETCH_BACKOFF","1.0"))     # 초, 재시도마다 2배
+FETCH_BACKOFF_MAX = float(os.getenv("FETCH_BACKOFF_MAX","10"))
+
 PG_DSN = (
     f"dbname={os.getenv('POSTGRES_DB')} "
     f"user={os.getenv('POSTGRES_USER')} "
@@ -31,22 +43,14 @@ MINIO_BUCKET = os.getenv("MINIO_BUCKET","fx-raw")
 def log(*a, **k): print(*a, **k, flush=True)
 
 def upsert_fx_rates(rows):
+    ts, pairs, prices = map(list, zip(*rows))
     conn = psycopg2.connect(PG_DSN)
     with conn, conn.cursor() as cur:
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS fx_rates (
-          ts timestamptz NOT NULL,
-          pair text NOT NULL,
-          price numeric(12,6) NOT NULL
-          , PRIMARY KEY (ts, pair)
-        );
-        """)
-        for ts_utc, pair, price in rows:
-            cur.execute("""
-              INSERT INTO fx_rates(ts, pair, price)
-              VALUES (%s, %s, %s)
-              ON CONFLICT (ts, pair) DO UPDATE SET price=EXCLUDED.price
-            """, (ts_utc, pair, price))
+        fx_schema.ensure_schema(cur)
+        fx_bars.ensure_schema(cur)
+        fx_schema.ensure_partitions(cur, ts)
+        cur.execute(fx_schema.UPSERT_SQL, (ts, pairs, prices))
+        fx_bars.refresh(cur, ts, pairs)
     conn.close()
 
 def save_minio_csv(rows, run_dt_local):
@@ -64,37 +68,71 @@ def save_minio_csv(rows, run_dt_local):
     s3.put_object(Bucket=MINIO_BUCKET, Key=key, Body=df.to_csv(index=False).encode("utf-8"))
     log(f"[minio] saved s3://{MINIO_BUCKET}/{key} ({len(rows)} rows)")
 
-def fetch_yahoo_pair(pair, retries=3, sleep_s=2):
-    tkr = YF_TICKER_MAP.get(pair, f"{pair}=X")
-    last_err = None
-    for _ in range(retries):
+def backoff(attempt):
+    """지수 백오프 + full jitter: 0 ~ min(FETCH_BACKOFF_MAX, FETCH_BACKOFF * 2^attempt) 초"""
+    return random.uniform(0, min(FETCH_BACKOFF_MAX, FETCH_BACKOFF * (2 ** attempt)))
+
+def _last_closes(df, tickers):
+    """yf.download 결과 -> {ticker: 마지막 종가} (종가가 없는 티커는 빠짐)"""
+    if df is None or df.empty:
+        return {}
+    if isinstance(df.columns, pd.MultiIndex):
+        # group_by="column": (Price, Ticker)
+        close = df["Close"] if "Close" in df.columns.get_level_values(0) else df.xs("Close", axis=1, level=1)
+    else:
+        close = df[["Close"]].set_axis(tickers[:1], axis=1)   # 티커 1개면 평평한 컬럼
+    out = {}
+    for tkr, s in close.items():
+        s = s.dropna()
+        if tkr in tickers and not s.empty:
+            out[tkr] = float(s.iloc[-1])
+    return out
+
+def fetch_yahoo_all(pairs):
+    """전체 티커를 yf.download 한 번으로 (실패/빈 티커만 백오프 후 재요청) -> {pair: price}"""
+    tickers = {pair: YF_TICKER_MAP.get(pair, f"{pair}=X") for pair in pairs}
+    got, last_err = {}, None
+    for attempt in range(FETCH_RETRIES):
+        todo = sorted({t for t in tickers.values() if t not in got})
+        if not todo:
+            break
+        if attempt:
+            time.sleep(backoff(attempt - 1))
         try:
             df = yf.download(
-                tickers=tkr, period="5d", interval="1d",
+                tickers=todo, period="5d", interval="1d",
                 progress=False, auto_adjust=False,
-                group_by="column", threads=False, timeout=30
+                group_by="column", threads=min(FETCH_WORKERS, len(todo)), timeout=30
             )
-            if isinstance(df.columns, pd.MultiIndex):
-                close = df[tkr]["Close"]
-            else:
-                close = df["Close"]
-            close = close.dropna()
-            if not close.empty:
-                return float(close.iloc[-1])
+            got.update(_last_closes(df, todo))
             last_err = "no close data"
         except Exception as e:
             last_err = str(e)
-        time.sleep(sleep_s)
-    log(f"[yahoo-fail] {pair}: {last_err}")
-    return None
+    for pair, tkr in tickers.items():
+        if tkr not in got:
+            log(f"[yahoo-fail] {pair}: {last_err}")
+    return {pair: got[tkr] for pair, tkr in tickers.items() if tkr in got}
+
+_session = None
+
+def get_session():
+    """stooq 용 공유 Session (커넥션 풀 크기 = FETCH_WORKERS, 재시도는 fetch_stooq_pair 가 직접)"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_WORKERS, max_retries=0)
+        _session.mount("https://", adapter)
+    return _session
 
-def fetch_stooq_pair(pair, retries=2, sleep_s=1):
+def fetch_stooq_pair(pair, retries=FETCH_RETRIES):
     sym = pair.lower()
     url = f"https://stooq.com/q/d/l/?s={sym}&i=d"
     last_err = None
-    for _ in range(retries):
+    for attempt in range(retries):
+        if attempt:
+            time.sleep(backoff(attempt - 1))
         try:
-            r = requests.get(url, timeout=15)
+            r = get_session().get(url, timeout=15)
             r.raise_for_status()
             df = pd.read_csv(io.StringIO(r.text))
             if not df.empty and "Close" in df.columns:
@@ -102,23 +140,31 @@ def fetch_stooq_pair(pair, retries=2, sleep_s=1):
             last_err = "no Close col"
         except Exception as e:
             last_err = str(e)
-        time.sleep(sleep_s)
     log(f"[stooq-fail] {pair}: {last_err}")
     return None
 
+def fetch_stooq_all(pairs):
+    """stooq fallback 을 스레드 풀로 동시에 -> {pair: price}"""
+    if not pairs:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(pairs))) as ex:
+        prices = dict(zip(pairs, ex.map(fetch_stooq_pair, pairs)))
+    return {pair: p for pair, p in prices.items() if p is not None}
+
 def fetch_once(run_dt_local):
     rows = []
-    base_now_utc = dt.datetime.now(dt.timezone.utc)
-    for idx, pair in enumerate(PAIRS):
-        price = fetch_yahoo_pair(pair)
-        if price is None:
-            price = fetch_stooq_pair(pair)
+    now_utc = dt.datetime.now(dt.timezone.utc)
+    t0 = time.perf_counter()
+    prices = fetch_yahoo_all(PAIRS)
+    prices.update(fetch_stooq_all([pair for pair in PAIRS if pair not in prices]))
+    for pair in PAIRS:
+        price = prices.get(pair)
         if price is None:
             log(f"[warn] no data for {pair}")
             continue
-        ts_utc = base_now_utc + dt.timedelta(seconds=idx)  # PK(ts) 충돌 방지
-        rows.append((ts_utc, pair, price))
+        rows.append((now_utc, pair, price))   # PK(pair, ts) 라 같은 시각이어도 충돌 없음
         log(f"[ok] {pair}={price}")
+    log(f"[fetch] {len(rows)}/{len(PAIRS)} pairs in {time.perf_counter()-t0:.1f}s")
     if rows:
         upsert_fx_rates(rows)
         save_minio_csv(rows, run_dt_local)